@@ -1,9 +1,10 @@
-import os, sys, re, config, webbrowser, platform, subprocess, zipfile, requests
-from PySide2.QtCore import QUrl, Qt, QEvent, QRegExp
+import os, sys, re, json, math, time, mmap, hashlib, tempfile, threading, traceback, multiprocessing, sqlite3, config, webbrowser, platform, subprocess, zipfile, requests
+from PySide2.QtCore import QUrl, Qt, QEvent, QEventLoop, QRegExp, QBuffer, QTimer, QObject, Signal
 from PySide2.QtGui import QIcon, QGuiApplication, QTextCursor
 from PySide2.QtPrintSupport import QPrinter, QPrintDialog
-from PySide2.QtWidgets import (QAction, QGridLayout, QInputDialog, QLineEdit, QMainWindow, QMessageBox, QPushButton, QToolBar, QWidget, QDialog, QFileDialog, QLabel, QFrame, QTextEdit, QProgressBar, QCheckBox, QTabWidget)
-from PySide2.QtWebEngineWidgets import QWebEnginePage, QWebEngineView
+from PySide2.QtWidgets import (QApplication, QAction, QGridLayout, QInputDialog, QLineEdit, QMainWindow, QMessageBox, QPushButton, QToolBar, QWidget, QDialog, QFileDialog, QLabel, QFrame, QTextEdit, QProgressBar, QCheckBox, QTabWidget)
+from PySide2.QtWebEngineWidgets import QWebEnginePage, QWebEngineView, QWebEngineProfile
+from PySide2.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
 from PySide2.QtTextToSpeech import QTextToSpeech, QVoice
 from TextCommandParser import TextCommandParser
 from BibleVerseParser import BibleVerseParser
@@ -12,6 +13,69 @@ from TextFileReader import TextFileReader
 from NoteSqlite import NoteSqlite
 from ThirdParty import Converter
 from shutil import copyfile
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import OrderedDict, deque
+try:
+    import numpy
+    isNumpyInstalled = True
+except ImportError:
+    isNumpyInstalled = False
+
+# default values for settings which are not found in config.py
+if not hasattr(config, "pageCacheSize"):
+    # memory budget of rendered page cache, in MB
+    config.pageCacheSize = 32
+if not hasattr(config, "streamingPageSize"):
+    # pages larger than this number of characters are loaded progressively, as users scroll down
+    config.streamingPageSize = 131072
+if not hasattr(config, "prefetchChapterDepth"):
+    # number of chapters before and after the opened one, which are rendered in advance; 0 to disable
+    config.prefetchChapterDepth = 1
+if not hasattr(config, "prefetchCacheSize"):
+    # memory budget of prefetched pages, in MB
+    config.prefetchCacheSize = 16
+if not hasattr(config, "instantDelay"):
+    # milliseconds to wait before displaying instant information, for the last target hovered only
+    config.instantDelay = 150
+if not hasattr(config, "instantCacheSize"):
+    # memory budget of cached instant information, in MB
+    config.instantCacheSize = 2
+if not hasattr(config, "lexiconCacheSize"):
+    # memory budget of lexical entries prepared for words of the opened original-language chapter, in MB
+    config.lexiconCacheSize = 8
+if not hasattr(config, "enableSearchIndex"):
+    # build full-text indexes of bible modules on first search, and use them for searching
+    config.enableSearchIndex = True
+if not hasattr(config, "moduleReadThreads"):
+    # maximum number of bible modules read at the same time, for COMPARE and PARALLEL commands
+    config.moduleReadThreads = 8
+if not hasattr(config, "enableLatencyProfiling"):
+    # record time spent in each stage of running text commands
+    config.enableLatencyProfiling = False
+if not hasattr(config, "latencyRecordSize"):
+    # maximum number of commands kept for latency statistics
+    config.latencyRecordSize = 1000
+if not hasattr(config, "taggingProcesses"):
+    # number of processes for tagging references in multiple files; 0 to use all cpu cores
+    config.taggingProcesses = 0
+if not hasattr(config, "importProcesses"):
+    # number of processes for importing 3rd party modules in a folder; 0 to use all cpu cores
+    config.importProcesses = 0
+if not hasattr(config, "streamingTaggingSize"):
+    # files larger than this size, in MB, are tagged chunk by chunk, instead of being read into memory as a whole
+    config.streamingTaggingSize = 16
+
+# tagging runs in worker processes; frozen executables started as workers run the worker here, instead of opening the app
+multiprocessing.freeze_support()
+# workers are spawned rather than forked, as forking the threads of QtWebEngine may deadlock the workers
+processContext = multiprocessing.get_context("spawn")
+
+# custom scheme for serving large pages from memory; it has to be registered before QApplication is created
+ubaScheme = QWebEngineUrlScheme(b"uba")
+ubaScheme.setFlags(QWebEngineUrlScheme.LocalScheme | QWebEngineUrlScheme.LocalAccessAllowed)
+QWebEngineUrlScheme.registerScheme(ubaScheme)
 
 class MainWindow(QMainWindow):
 
@@ -21,8 +85,32 @@ class MainWindow(QMainWindow):
         self.mainHistoryPage = [False, False, False, False, False]
         self.studyHistoryPage = [False, False, False, False, False]
         self.lastLoadedCommand = {"main": None, "study": None}
+        # remaining content of progressively loaded pages, for each view and tab
+        self.htmlStreams = {}
 
         self.textCommandParser = TextCommandParser(self)
+        # long-lived database connections, shared by all actions
+        self.databases = databaseConnections
+
+        self.pageCache = PageCache(config.pageCacheSize * 1048576)
+        self.prefetchCache = PageCache(config.prefetchCacheSize * 1048576)
+        self.prefetchQueue = []
+        self.prefetchTimer = QTimer(self)
+        self.prefetchTimer.setSingleShot(True)
+        self.prefetchTimer.timeout.connect(self.prefetchNext)
+
+        self.instantCache = PageCache(config.instantCacheSize * 1048576)
+        self.pendingInstantCommand = None
+        self.instantTimer = QTimer(self)
+        self.instantTimer.setSingleShot(True)
+        self.instantTimer.timeout.connect(self.runPendingInstantCommand)
+
+        self.lexiconCache = PageCache(config.lexiconCacheSize * 1048576)
+        self.lexiconQueue = []
+        # memory taken by lexical entries prepared for the opened chapter
+        self.lexiconQueueSize = 0
+
+        self.latencyRecorder = LatencyRecorder(config.latencyRecordSize)
 
         self.setWindowTitle('Unique Bible App')
 
@@ -35,6 +123,9 @@ class MainWindow(QMainWindow):
         self.setAdditionalToolBar()
         self.setupBaseUrl()
 
+        self.pageSchemeHandler = PageSchemeHandler(self)
+        QWebEngineProfile.defaultProfile().installUrlSchemeHandler(b"uba", self.pageSchemeHandler)
+
         self.mainView = None
         self.studyView = None
         self.noteEditor = None
@@ -73,17 +164,19 @@ class MainWindow(QMainWindow):
         if self.noteEditor:
             if self.noteEditor.close():
                 event.accept()
+                self.databases.close()
                 qApp.quit()
             else:
                 event.ignore()
         else:
             event.accept()
+            self.databases.close()
             qApp.quit()
 
     # check migration
     def checkMigration(self):
         if config.version >= 0.56:
-            biblesSqlite = BiblesSqlite()
+            biblesSqlite = self.databases.bibles()
             biblesWithBothVersions = biblesSqlite.migratePlainFormattedBibles()
             if biblesWithBothVersions:
                 initialMessage = ("Migration is needed.", "It looks like that all or some of your bible files are not up-to-date for running this version.  We are helping you to update those files.  It will take a while.  When it is finished, you will receive another message.")
@@ -91,7 +184,6 @@ class MainWindow(QMainWindow):
                 biblesSqlite.proceedMigration(biblesWithBothVersions)
                 finishMessage = ("Migration is finished." , "Your bible files are updated. Enjoy!")
                 self.displayNotice(finishMessage)
-            del biblesSqlite
 
     def displayNotice(self, title_message):
         title, message = title_message
@@ -172,6 +264,10 @@ class MainWindow(QMainWindow):
         self.downloader.show()
 
     def moduleInstalled(self, file):
+        self.clearModuleCache()
+        if file == "cross-reference.sqlite":
+            # start generating the cross-reference index in background
+            getCrossReferenceIndex("ScrollMapper")
         self.downloader.close()
         self.mainPage.runJavaScript('alert("{0}{1}{0} was downloaded and installed successfully.")'.format("'", file))
 
@@ -243,6 +339,7 @@ class MainWindow(QMainWindow):
         menu4.addSeparator()
         menu4.addAction(QAction("C&ross References", self, shortcut = "Ctrl+R", triggered=self.runCROSSREFERENCE))
         menu4.addAction(QAction("TSK (&Enhanced)", self, shortcut = "Ctrl+E", triggered=self.runTSKE))
+        menu4.addAction(QAction("Verses Referencing T&his", self, triggered=self.runREVERSECROSSREFERENCE))
         menu4.addSeparator()
         menu4.addAction(QAction("&Compare All Versions", self, shortcut = "Ctrl+D", triggered=self.runCOMPARE))
         menu4.addAction(QAction("&Compare with ...", self, triggered=self.mainRefButtonClicked))
@@ -315,6 +412,8 @@ class MainWindow(QMainWindow):
         menu10.addSeparator()
         menu10.addAction(QAction("&Credits", self, triggered=self.openCredits))
         menu10.addSeparator()
+        menu10.addAction(QAction("&Export Latency Statistics", self, triggered=self.exportLatencyStatistics))
+        menu10.addSeparator()
         menu10.addAction(QAction("&Contact Eliran Wong", self, triggered=self.contactEliranWong))
 
     def setupToolBar(self):
@@ -1177,25 +1276,11 @@ class MainWindow(QMainWindow):
 
     # convert bible references to string
     def bcvToVerseReference(self, b, c, v):
-        parser = BibleVerseParser(config.parserStandarisation)
-        verseReference = parser.bcvToVerseReference(b, c, v)
-        del parser
-        return verseReference
+        return bcvToVerseReference(b, c, v)
 
     # Open text on left and right view
     def openTextOnMainView(self, text):
-        if sys.getsizeof(text) < 2097152:
-            self.mainView.setHtml(text, baseUrl)
-        else:
-            # write text in a text file
-            # reason: setHTML does not work with content larger than 2 MB
-            outputFile = os.path.join("htmlResources", "main.html")
-            fileObject = open(outputFile, 'w')
-            fileObject.write(text)
-            fileObject.close()
-            # open the text file with webview
-            fullOutputPath = os.path.abspath(outputFile)
-            self.mainView.load(QUrl.fromLocalFile(fullOutputPath))
+        self.loadHtml(self.mainView, "main", text)
         reference = " - ".join(self.verseReference("main"))
         if self.textCommandParser.lastKeyword in ("compare", "parallel"):
             *_, reference2 = reference.split(" - ")
@@ -1211,23 +1296,81 @@ class MainWindow(QMainWindow):
 #        else:
 #            nextIndex = currentIndex + 1
 #        self.studyView.setCurrentWidget(self.studyView.widget(nextIndex))
-        if sys.getsizeof(text) < 2097152:
-            self.studyView.setHtml(text, baseUrl)
-        else:
-            # write text in a text file
-            # reason: setHTML does not work with content larger than 2 MB
-            outputFile = os.path.join("htmlResources", "study.html")
-            fileObject = open(outputFile, 'w')
-            fileObject.write(text)
-            fileObject.close()
-            # open the text file with webview
-            fullOutputPath = os.path.abspath(outputFile)
-            self.studyView.load(QUrl.fromLocalFile(fullOutputPath))
+        self.loadHtml(self.studyView, "study", text)
         if config.parallelMode == 0:
             self.parallel()
         self.studyView.setTabText(self.studyView.currentIndex(), self.textCommandParser.lastKeyword)
         self.studyView.setTabToolTip(self.studyView.currentIndex(), self.textCommandParser.lastKeyword)
 
+    def loadHtml(self, tabWidget, name, text):
+        self.htmlStreams.pop((name, tabWidget.currentIndex()), None)
+        if len(text) > config.streamingPageSize:
+            text = self.startHtmlStream(tabWidget, name, text)
+        content = text.encode("utf-8")
+        # setHtml does not work with content larger than 2MB, after it is encoded into a base64 data url
+        if len(content) * 4 / 3 < 2097152:
+            tabWidget.setHtml(text, baseUrl)
+        else:
+            # serve large content from memory, one page for each tab
+            tabWidget.load(self.pageSchemeHandler.setPage("{0}/{1}".format(name, tabWidget.currentIndex()), content))
+
+    # load the first part of a large page only; the rest is appended as users scroll down
+    def startHtmlStream(self, tabWidget, name, text):
+        bodyStart = "<span id='v0.0.0'></span>"
+        bodyEnd = "</body></html>"
+        if not (bodyStart in text and text.endswith(bodyEnd)):
+            return text
+        head, content = text.split(bodyStart, 1)
+        content = content[:-len(bodyEnd)]
+        # the first part must include the active verse, so that it can be scrolled into view
+        activeVerse = re.search("id=['{0}]{1}['{0}]".format('"', re.escape(verseElementId(self.getVerseId(name)))), content)
+        activeVersePosition = activeVerse.end() if activeVerse else 0
+        chunks = htmlChunks(content, config.streamingPageSize)
+        firstChunk = ""
+        for chunk in chunks:
+            firstChunk += chunk
+            if len(firstChunk) >= activeVersePosition:
+                break
+        self.htmlStreams[(name, tabWidget.currentIndex())] = chunks
+        moreHtmlScript = "<script>var moreHtmlRequests = 0; var moreHtmlPending = false; window.addEventListener('scroll', function() { if (!moreHtmlPending && window.innerHeight + window.pageYOffset >= document.body.scrollHeight - 2 * window.innerHeight) { moreHtmlPending = true; moreHtmlRequests += 1; document.title = '_morehtml:::' + moreHtmlRequests; } });</script>"
+        return "{0}{1}{2}{3}{4}".format(head, bodyStart, firstChunk, moreHtmlScript, bodyEnd)
+
+    def loadMoreHtml(self, source):
+        if source == "main":
+            tabWidget, page = self.mainView, self.mainPage
+        elif source == "study":
+            tabWidget, page = self.studyView, self.studyPage
+        else:
+            return
+        chunks = self.htmlStreams.get((source, tabWidget.currentIndex()), None)
+        chunk = next(chunks, None) if chunks is not None else None
+        if chunk is None:
+            self.htmlStreams.pop((source, tabWidget.currentIndex()), None)
+            # nothing left to load; stop sending requests
+            page.runJavaScript("moreHtmlPending = true;")
+        else:
+            page.runJavaScript("document.body.insertAdjacentHTML('beforeend', {0}); moreHtmlPending = false;".format(json.dumps(chunk)))
+            if source == "main":
+                self.markVerseNotes()
+
+    # load all of a large page, before actions which read the whole page, e.g. export to pdf and copy; then run callback
+    # selections which reach the end of the loaded part are extended to the end of the page
+    def completeHtmlStream(self, source, callback):
+        if source == "main":
+            tabWidget, page = self.mainView, self.mainPage
+        elif source == "study":
+            tabWidget, page = self.studyView, self.studyPage
+        else:
+            return callback()
+        chunks = self.htmlStreams.pop((source, tabWidget.currentIndex()), None)
+        html = "".join(chunks) if chunks is not None else ""
+        if not html:
+            return callback()
+        script = "var selection = window.getSelection(); var selectionToEnd = false; if (selection.rangeCount) { var rest = document.createRange(); rest.selectNodeContents(document.body); rest.setStart(selection.getRangeAt(0).endContainer, selection.getRangeAt(0).endOffset); selectionToEnd = !rest.toString().trim(); } document.body.insertAdjacentHTML('beforeend', {0}); moreHtmlPending = true; if (selectionToEnd) { selection.extend(document.body, document.body.childNodes.length); }"
+        page.runJavaScript(script.replace("{0}", json.dumps(html)), lambda result: callback())
+        if source == "main":
+            self.markVerseNotes()
+
     # warning for next action without saving modified notes
     def warningNotSaved(self):
         msgBox = QMessageBox(QMessageBox.Warning,
@@ -1269,29 +1412,43 @@ class MainWindow(QMainWindow):
     def openStudyVerseNote(self):
         self.openVerseNote(config.studyB, config.studyC, config.studyV)
 
+    # bcv: "book.chapter" for chapter notes, "book.chapter.verse" for verse notes
+    def openNote(self, bcv):
+        bcv = [int(i) for i in bcv.split(".")]
+        if len(bcv) == 2:
+            self.openChapterNote(*bcv)
+        else:
+            self.openVerseNote(*bcv)
+
+    # add a link to the notes of each verse on main view which has one
+    def markVerseNotes(self):
+        b, c = config.mainB, config.mainC
+        hasChapterNote, verses = self.databases.noteIndex().getChapterNotes(b, c)
+        if verses:
+            marks = {verseElementId(encodeVerseId(b, c, v)): "<ref onclick='document.title=\"_opennote:::{0}.{1}.{2}\"'>&#9998;</ref> ".format(b, c, v) for v in verses}
+            self.mainPage.runJavaScript("var noteMarks = {0}; for (var id in noteMarks) {{ var verse = document.getElementById(id); if (verse != null && !verse.dataset.note) {{ verse.dataset.note = 'true'; verse.insertAdjacentHTML('afterend', noteMarks[id]); }} }}".format(json.dumps(marks)))
+
     def openChapterNote(self, b, c):
         self.textCommandParser.lastKeyword = "note"
-        reference = BibleVerseParser(config.parserStandarisation).bcvToVerseReference(b, c, 1)
+        reference = self.bcvToVerseReference(b, c, 1)
         config.studyB, config.studyC, config.studyV = b, c, 1
         self.updateStudyRefButton()
         config.commentaryB, config.commentaryC, config.commentaryV = b, c, 1
         self.updateCommentaryRefButton()
-        noteSqlite = NoteSqlite()
+        noteSqlite = self.databases.notes()
         note = "<p><b>Note on {0}</b> &ensp;<button class='feature' onclick='document.title=\"_editchapternote:::\"'>edit</button></p>{1}".format(reference[:-2], noteSqlite.displayChapterNote((b, c)))
-        del noteSqlite
         note = self.htmlWrapper(note, True, "study", False)
         self.openTextOnStudyView(note)
 
     def openVerseNote(self, b, c, v):
         self.textCommandParser.lastKeyword = "note"
-        reference = BibleVerseParser(config.parserStandarisation).bcvToVerseReference(b, c, v)
+        reference = self.bcvToVerseReference(b, c, v)
         config.studyB, config.studyC, config.studyV = b, c, v
         self.updateStudyRefButton()
         config.commentaryB, config.commentaryC, config.commentaryV = b, c, v
         self.updateCommentaryRefButton()
-        noteSqlite = NoteSqlite()
+        noteSqlite = self.databases.notes()
         note = "<p><b>Note on {0}</b> &ensp;<button class='feature' onclick='document.title=\"_editversenote:::\"'>edit</button></p>{1}".format(reference, noteSqlite.displayVerseNote((b, c, v)))
-        del noteSqlite
         note = self.htmlWrapper(note, True, "study", False)
         self.openTextOnStudyView(note)
 
@@ -1313,7 +1470,7 @@ class MainWindow(QMainWindow):
         for search, replace in searchReplace2:
             text = re.sub(search, replace, text)
         if parsing:
-            text = BibleVerseParser(config.parserStandarisation).parseText(text)
+            text = parseReferences(text)
         if view == "main":
             activeBCVsettings = "<script>var activeText = '{0}'; var activeB = {1}; var activeC = {2}; var activeV = {3};</script>".format(config.mainText, config.mainB, config.mainC, config.mainV)
         elif view == "study":
@@ -1437,11 +1594,11 @@ class MainWindow(QMainWindow):
     # Actions - export to pdf
     def printMainPage(self):
         file = "UniqueBible.app.pdf"
-        self.mainPage.printToPdf(file)
+        self.completeHtmlStream("main", lambda: self.mainPage.printToPdf(file))
 
     def printStudyPage(self):
         file = "UniqueBible.app.pdf"
-        self.studyPage.printToPdf(file)
+        self.completeHtmlStream("study", lambda: self.studyPage.printToPdf(file))
 
     # import BibleBentoPlus modules
     def importBBPlusLexiconInAFolder(self):
@@ -1451,6 +1608,7 @@ class MainWindow(QMainWindow):
                 self.directoryLabel.text(), options)
         if directory:
             if Converter().importBBPlusLexiconInAFolder(directory):
+                self.clearModuleCache()
                 self.mainPage.runJavaScript("alert('Multiple BibleBento Plus lexicons imported.')")
             else:
                 self.mainPage.runJavaScript("alert('No supported module is found in the selected folder.')")
@@ -1462,6 +1620,7 @@ class MainWindow(QMainWindow):
                 self.directoryLabel.text(), options)
         if directory:
             if Converter().importBBPlusDictionaryInAFolder(directory):
+                self.clearModuleCache()
                 self.mainPage.runJavaScript("alert('Multiple BibleBento Plus dictionaries imported.')")
             else:
                 self.mainPage.runJavaScript("alert('No supported module is found in the selected folder.')")
@@ -1501,8 +1660,9 @@ class MainWindow(QMainWindow):
                 "QFileDialog.getExistingDirectory()",
                 self.directoryLabel.text(), options)
         if directory:
-            if Converter().importAllFilesInAFolder(directory):
-                self.mainPage.runJavaScript("alert('Multiple 3rd party modules imported.')")
+            files = [os.path.join(directory, file) for file in sorted(os.listdir(directory)) if getModuleImporter(file) is not None and os.path.isfile(os.path.join(directory, file))]
+            if files:
+                ImportProgress(self, files).exec_()
             else:
                 self.mainPage.runJavaScript("alert('No supported module is found in the selected folder.')")
 
@@ -1544,11 +1704,15 @@ class MainWindow(QMainWindow):
         self.completeImport()
 
     def completeImport(self):
+        self.clearModuleCache()
         self.mainPage.runJavaScript("alert('3rd Party Module Installed.')")
 
     # Actions - tag files with BibleVerseParser
-    def onTaggingCompleted(self):
-        self.mainPage.runJavaScript("alert('Finished. Tagged file(s) is/are named with a prefix \"tagged_\".')")
+    def onTaggingCompleted(self, throughput=None):
+        if throughput is None:
+            self.mainPage.runJavaScript("alert('Finished. Tagged file(s) is/are named with a prefix \"tagged_\".')")
+        else:
+            self.mainPage.runJavaScript("alert('Finished at {0:.2f} MB/s. Tagged file(s) is/are named with a prefix \"tagged_\".')".format(throughput))
 
     def tagFile(self):
         options = QFileDialog.Options()
@@ -1557,8 +1721,7 @@ class MainWindow(QMainWindow):
                 self.openFileNameLabel.text(),
                 "All Files (*);;Text Files (*.txt);;CSV Files (*.csv);;TSV Files (*.tsv)", "", options)
         if fileName:
-            BibleVerseParser(config.parserStandarisation).startParsing(fileName)
-            self.onTaggingCompleted()
+            TaggingProgress(self, [fileName]).exec_()
 
     def tagFiles(self):
         options = QFileDialog.Options()
@@ -1566,11 +1729,7 @@ class MainWindow(QMainWindow):
                 "QFileDialog.getOpenFileNames()", self.openFilesPath,
                 "All Files (*);;Text Files (*.txt);;CSV Files (*.csv);;TSV Files (*.tsv)", "", options)
         if files:
-            parser = BibleVerseParser(config.parserStandarisation)
-            for file in files:
-                parser.startParsing(file)
-            del parser
-            self.onTaggingCompleted()
+            TaggingProgress(self, files).exec_()
 
     def tagFolder(self):
         options = QFileDialog.DontResolveSymlinks | QFileDialog.ShowDirsOnly
@@ -1578,10 +1737,15 @@ class MainWindow(QMainWindow):
                 "QFileDialog.getExistingDirectory()",
                 self.directoryLabel.text(), options)
         if directory:
-            path, file = os.path.split(directory)
-            outputFile = os.path.join(path, "output_{0}".format(file))
-            BibleVerseParser(config.parserStandarisation).startParsing(directory)
-            self.onTaggingCompleted()
+            files = getFilesToTag(directory)
+            # files tagged before, and not changed since then, are skipped
+            manifest = TaggingManifest(directory)
+            files = manifest.getChangedFiles(files)
+            if files:
+                TaggingProgress(self, files, manifest).exec_()
+            else:
+                manifest.save()
+                self.onTaggingCompleted()
 
     # Actions - hide / show tool bars
     def hideShowMainToolBar(self):
@@ -1894,23 +2058,23 @@ class MainWindow(QMainWindow):
 
     # Actions - previous / next chapter
     def previousMainChapter(self):
-        newChapter = config.mainC - 1
-        biblesSqlite = BiblesSqlite()
-        mainChapterList = biblesSqlite.getChapterList()
-        del biblesSqlite
-        if newChapter in mainChapterList:
-            newTextCommand = self.bcvToVerseReference(config.mainB, newChapter, 1)
-            self.textCommandChanged(newTextCommand, "main")
+        self.openMainChapterId(chapterVerseId(self.getVerseId("main"), -1))
 
     def nextMainChapter(self):
-        newChapter = config.mainC + 1
-        biblesSqlite = BiblesSqlite()
-        mainChapterList = biblesSqlite.getChapterList()
-        del biblesSqlite
-        if newChapter in mainChapterList:
-            newTextCommand = self.bcvToVerseReference(config.mainB, newChapter, 1)
+        self.openMainChapterId(chapterVerseId(self.getVerseId("main"), 1))
+
+    def openMainChapterId(self, verseId):
+        b, c, v = decodeVerseId(verseId)
+        if b == config.mainB and self.hasMainChapter(c):
+            newTextCommand = self.bcvToVerseReference(b, c, v)
             self.textCommandChanged(newTextCommand, "main")
 
+    def hasMainChapter(self, chapter):
+        versificationIndex = getVersificationIndex(config.mainText)
+        if versificationIndex is not None:
+            return versificationIndex.hasChapter(config.mainB, chapter)
+        return chapter in self.databases.bibles().getChapterList()
+
     def openMainChapter(self):
         newTextCommand = self.bcvToVerseReference(config.mainB, config.mainC, config.mainV)
         self.textCommandChanged(newTextCommand, "main")
@@ -2026,12 +2190,15 @@ class MainWindow(QMainWindow):
 
     # finish view loading
     def finishMainViewLoading(self):
+        self.latencyRecorder.finishLoading("main")
+        self.markVerseNotes()
         # scroll to the main verse
-        self.mainPage.runJavaScript("var activeVerse = document.getElementById('v"+str(config.mainB)+"."+str(config.mainC)+"."+str(config.mainV)+"'); if (typeof(activeVerse) != 'undefined' && activeVerse != null) { activeVerse.scrollIntoView(); activeVerse.style.color = 'red'; } else { document.getElementById('v0.0.0').scrollIntoView(); }")
+        self.mainPage.runJavaScript("var activeVerse = document.getElementById('"+verseElementId(self.getVerseId("main"))+"'); if (typeof(activeVerse) != 'undefined' && activeVerse != null) { activeVerse.scrollIntoView(); activeVerse.style.color = 'red'; } else { document.getElementById('v0.0.0').scrollIntoView(); }")
 
     def finishStudyViewLoading(self):
+        self.latencyRecorder.finishLoading("study")
         # scroll to the study verse
-        self.studyPage.runJavaScript("var activeVerse = document.getElementById('v"+str(config.studyB)+"."+str(config.studyC)+"."+str(config.studyV)+"'); if (typeof(activeVerse) != 'undefined' && activeVerse != null) { activeVerse.scrollIntoView(); activeVerse.style.color = 'red'; } else { document.getElementById('v0.0.0').scrollIntoView(); }")
+        self.studyPage.runJavaScript("var activeVerse = document.getElementById('"+verseElementId(self.getVerseId("study"))+"'); if (typeof(activeVerse) != 'undefined' && activeVerse != null) { activeVerse.scrollIntoView(); activeVerse.style.color = 'red'; } else { document.getElementById('v0.0.0').scrollIntoView(); }")
 
     # finish pdf printing
     def pdfPrintingFinishedAction(self, filePath, success):
@@ -2070,6 +2237,19 @@ class MainWindow(QMainWindow):
     def runTSKE(self):
         self.runFeature("TSKE")
 
+    # verses of which cross-references include the verse opened on main view
+    def runREVERSECROSSREFERENCE(self):
+        crossReferenceIndex = getCrossReferenceIndex("ScrollMapper")
+        if crossReferenceIndex is None:
+            if os.path.isfile(os.path.join("marvelData", "cross-reference.sqlite")):
+                self.mainPage.runJavaScript('alert("Cross-reference index is being prepared. Please try again shortly.")')
+            else:
+                self.mainPage.runJavaScript('alert("Cross-reference data is not installed.")')
+            return
+        b, c, v = config.mainB, config.mainC, config.mainV
+        html = crossReferenceHtml(b, c, v, crossReferenceIndex.getSources(encodeVerseId(b, c, v)), config.mainText)
+        self.openTextOnStudyView(self.htmlWrapper(html, False, "study", False))
+
     def runTRANSLATION(self):
         self.runFeature("TRANSLATION")
 
@@ -2101,22 +2281,56 @@ class MainWindow(QMainWindow):
     # change of text command detected via change of document.title
     def textCommandChanged(self, newTextCommand, source="main"):
         exceptionTuple = ("UniqueBible.app", "about:blank", "study.html")
-        if not (newTextCommand.startswith("data:text/html;") or newTextCommand.startswith("file:///") or newTextCommand[-4:] == ".txt" or newTextCommand in exceptionTuple):
+        if not (newTextCommand.startswith("data:text/html;") or newTextCommand.startswith("file:///") or newTextCommand.startswith("uba:") or newTextCommand[-4:] == ".txt" or newTextCommand in exceptionTuple):
             if source == "main" and not newTextCommand.startswith("_"):
                 self.textCommandLineEdit.setText(newTextCommand)
-            if newTextCommand.startswith("_"):
+            if newTextCommand.startswith("_morehtml:::"):
+                self.loadMoreHtml(source)
+            elif newTextCommand.startswith("_opennote:::"):
+                self.openNote(newTextCommand[12:])
+            elif self.isInstantCommand(newTextCommand, source):
+                # mouse hovering triggers many commands; run only the last one within a short period
+                self.pendingInstantCommand = (newTextCommand, source)
+                self.instantTimer.start(config.instantDelay)
+            elif newTextCommand.startswith("_"):
                 self.runTextCommand(newTextCommand, False, source)
             else:
                 self.runTextCommand(newTextCommand, True, source)
 
+    def isInstantCommand(self, textCommand, source):
+        return textCommand.startswith("_instant") or (source == "instant" and textCommand.startswith("_"))
+
+    def runPendingInstantCommand(self):
+        if self.pendingInstantCommand is not None:
+            textCommand, source = self.pendingInstantCommand
+            self.pendingInstantCommand = None
+            self.runTextCommand(textCommand, False, source)
+
+    def exportLatencyStatistics(self):
+        if not config.enableLatencyProfiling:
+            self.mainPage.runJavaScript("alert('Latency profiling is disabled. Set enableLatencyProfiling to True in config.py to enable it.')")
+            return
+        options = QFileDialog.Options()
+        fileName, filtr = QFileDialog.getSaveFileName(self,
+                "QFileDialog.getSaveFileName()",
+                "latency.json",
+                "JSON Files (*.json);;All Files (*)", "", options)
+        if fileName:
+            self.latencyRecorder.exportJson(fileName)
+
     # change of text command detected via user input
     def textCommandEntered(self, source="main"):
         newTextCommand = self.textCommandLineEdit.text()
         self.runTextCommand(newTextCommand, True, source)
 
+    # TextCommandParser writes the active texts and verses to config, and may update widgets; commands therefore run on the gui thread
     def runTextCommand(self, textCommand, addRecord=True, source="main"):
-        view, content = self.textCommandParser.parser(textCommand, source)
+        latencyRecord = self.latencyRecorder.start(textCommand)
+        view, content, html = self.renderTextCommand(textCommand, source, latencyRecord)
+        self.displayTextCommand(textCommand, addRecord, source, view, content, html, latencyRecord)
 
+    def displayTextCommand(self, textCommand, addRecord, source, view, content, html, latencyRecord=None):
+        pageLoaded = False
         if content == "INVALID_COMMAND_ENTERED":
             self.mainPage.runJavaScript("alert('Invalid command not processed.')")
         elif view == "":
@@ -2128,51 +2342,292 @@ class MainWindow(QMainWindow):
             self.textCommandLineEdit.setText(content)
             self.textCommandLineEdit.setFocus()
         else:
-            activeBCVsettings = ""
-            if view == "main":
-                activeBCVsettings = "<script>var activeText = '{0}'; var activeB = {1}; var activeC = {2}; var activeV = {3};</script>".format(config.mainText, config.mainB, config.mainC, config.mainV)
-            elif view == "study":
-                activeBCVsettings = "<script>var activeText = '{0}'; var activeB = {1}; var activeC = {2}; var activeV = {3};</script>".format(config.studyText, config.studyB, config.studyC, config.studyV)
-            html = "<!DOCTYPE html><html><head><title>UniqueBible.app</title><link rel='stylesheet' type='text/css' href='theText.css'><script src='theText.js'></script><script src='w3.js'></script>{0}<script>var versionList = []; var compareList = []; var parallelList = [];</script></head><body style='font-size: {1}%;'><span id='v0.0.0'></span>{2}</body></html>".format(activeBCVsettings, config.fontSize, content)
             views = {
                 "main": self.mainView,
                 "study": self.studyView,
                 "instant": self.instantView,
             }
-            # final touch to transform text HERE
-            searchReplace = (
-                ('onclick=[{0}"]bcv\(([0-9]+?),[ ]*?([0-9]+?),[ ]*?([0-9]+?)\)[{0}"]'.format("'"), r'onclick="bcv(\1,\2,\3)" onmouseover="imv(\1,\2,\3)"'),
-                ('onclick=[{0}"]cr\(([0-9]+?),[ ]*?([0-9]+?),[ ]*?([0-9]+?)\)[{0}"]'.format("'"), self.convertCrLink),
-            )
-            for search, replace in searchReplace:
-                html = re.sub(search, replace, html)
             # load into widget view
             if view == "study":
-                # save html in a separate file if text is larger than 2MB
-                # reason: setHTML does not work with content larger than 2MB
                 newCommand = (self.studyView.currentIndex(), textCommand)
                 if self.studyHistoryPage[self.studyView.currentIndex()] or self.lastLoadedCommand[view] != newCommand:
                     self.openTextOnStudyView(html)
+                    pageLoaded = True
                     self.lastLoadedCommand["study"] = newCommand
             elif view == "main":
-                # save html in a separate file if text is larger than 2MB
-                # reason: setHTML does not work with content larger than 2MB
                 newCommand = (self.mainView.currentIndex(), textCommand)
                 if self.mainHistoryPage[self.mainView.currentIndex()] or self.lastLoadedCommand[view] != newCommand:
                     self.openTextOnMainView(html)
+                    pageLoaded = True
                     self.lastLoadedCommand["main"] = newCommand
             elif view.startswith("popover"):
                 view = view.split(".")[1]
                 views[view].currentWidget().openPopover(html=html)
             else:
                 views[view].setHtml(html, baseUrl)
+            if view in ("main", "study"):
+                self.updateRefButtons()
             if addRecord == True and view in ("main", "study"):
                 self.addHistoryRecord(view, textCommand)
+            if view == "main" and self.textCommandParser.lastKeyword == "bible":
+                self.startPrefetch(html)
+        self.latencyRecorder.mark(latencyRecord, "display")
+        if pageLoaded:
+            # the record is completed when the view finishes loading
+            self.latencyRecorder.waitForLoading(view, latencyRecord)
+        else:
+            self.latencyRecorder.finish(latencyRecord)
+
+    # parse a text command into a complete html page; rendered pages are cached
+    def renderTextCommand(self, textCommand, source="main", latencyRecord=None):
+        pageKey = self.getPageKey(textCommand, source)
+        pageCache = self.instantCache if self.isInstantCommand(textCommand, source) else self.pageCache
+        if pageKey is not None:
+            cachedPage = pageCache.get(pageKey)
+            if cachedPage is None and pageCache is self.pageCache:
+                cachedPage = self.prefetchCache.get(pageKey)
+            if cachedPage is None:
+                cachedPage = self.lexiconCache.get(pageKey)
+            if cachedPage is not None:
+                view, html, stateChanges, lastKeyword = cachedPage
+                self.restoreViewState(stateChanges)
+                self.textCommandParser.lastKeyword = lastKeyword
+                self.latencyRecorder.mark(latencyRecord, "cache")
+                return (view, "", html)
+
+        view, content, html, page = self.parseTextCommand(textCommand, source, latencyRecord)
+        if pageKey is not None and page is not None:
+            pageCache.set(pageKey, page, sys.getsizeof(html))
+        return (view, content, html)
+
+    def parseTextCommand(self, textCommand, source="main", latencyRecord=None):
+        stateBefore = self.getViewState()
+        self.latencyRecorder.mark(latencyRecord, "cache")
+        view, content = self.parseCrossReferenceCommand(textCommand) or self.parseComparisonCommand(textCommand) or self.parseSearchCommand(textCommand) or self.textCommandParser.parser(textCommand, source)
+        self.latencyRecorder.mark(latencyRecord, "parser")
+        if content == "INVALID_COMMAND_ENTERED" or view in ("", "command"):
+            return (view, content, "", None)
+
+        activeBCVsettings = ""
+        if view == "main":
+            activeBCVsettings = "<script>var activeText = '{0}'; var activeB = {1}; var activeC = {2}; var activeV = {3};</script>".format(config.mainText, config.mainB, config.mainC, config.mainV)
+        elif view == "study":
+            activeBCVsettings = "<script>var activeText = '{0}'; var activeB = {1}; var activeC = {2}; var activeV = {3};</script>".format(config.studyText, config.studyB, config.studyC, config.studyV)
+        html = "<!DOCTYPE html><html><head><title>UniqueBible.app</title><link rel='stylesheet' type='text/css' href='theText.css'><script src='theText.js'></script><script src='w3.js'></script>{0}<script>var versionList = []; var compareList = []; var parallelList = [];</script></head><body style='font-size: {1}%;'><span id='v0.0.0'></span>{2}</body></html>".format(activeBCVsettings, config.fontSize, content)
+        # final touch to transform text HERE
+        html = linkRewriter.rewrite(html)
+        self.latencyRecorder.mark(latencyRecord, "postprocess")
+
+        page = None
+        if view in ("main", "study", "instant"):
+            stateAfter = self.getViewState()
+            stateChanges = {item: value for item, value in stateAfter.items() if stateBefore[item] != value}
+            page = (view, html, stateChanges, self.textCommandParser.lastKeyword)
+        return (view, content, html, page)
+
+    # CROSSREFERENCE commands are answered from the cross-reference index, with verses of the main bible
+    # until the index is ready, cross-references of the requested verses are read from the database, for the same page
+    def parseCrossReferenceCommand(self, textCommand):
+        command = re.match("^CROSSREFERENCE:::(.+?)$", textCommand, re.IGNORECASE)
+        if not command or not os.path.isfile(os.path.join("marvelData", "cross-reference.sqlite")):
+            return None
+        verseList = extractReferences(command.group(1), False)
+        if not verseList:
+            return None
+        crossReferenceIndex = getCrossReferenceIndex("ScrollMapper")
+        if crossReferenceIndex is not None:
+            getTargets = crossReferenceIndex.getTargets
+        else:
+            getTargets = lambda verseId: readCrossReferenceTargets("ScrollMapper", verseId)
+        content = "".join([crossReferenceHtml(b, c, v, getTargets(encodeVerseId(b, c, v)), config.mainText) for b, c, v, *_ in verseList])
+        config.studyB, config.studyC, config.studyV = verseList[0][:3]
+        self.textCommandParser.lastKeyword = "crossreference"
+        return ("study", content)
+
+    # COMPARE and PARALLEL commands read all compared bibles at the same time, one thread for each module, and are rendered here
+    # e.g. COMPARE:::KJV_NET:::John 3:16, PARALLEL:::KJV_NET:::John 3; all installed bibles are compared if no bible is given
+    def parseComparisonCommand(self, textCommand):
+        command = re.match("^(COMPARE|PARALLEL):::(.+?)$", textCommand, re.IGNORECASE)
+        if not command:
+            return None
+        keyword = command.group(1).lower()
+        *texts, reference = command.group(2).split(":::")
+        texts = texts[0].split("_") if texts else getBibleList()
+        verseList = extractReferences(reference, False)
+        # bibles which are not installed are reported by the parser
+        if not texts or not verseList or (None, None) in [getBibleTable(text) for text in texts]:
+            return None
+        b, c, v, *_ = verseList[0]
+        if keyword == "parallel":
+            # chapters are compared side by side
+            verseList = [(b, c, 1, 255)]
+        bibles = readBiblesConcurrently(texts, verseList)
+        if bibles is None:
+            return None
+        content = compareVersesHtml(bibles) if keyword == "compare" else parallelVersesHtml(b, c, bibles)
+        config.mainB, config.mainC, config.mainV = b, c, v
+        self.textCommandParser.lastKeyword = keyword
+        return ("main", content)
+
+    # SEARCH commands are answered with full-text indexes of bibles, once they are ready, and rendered here in both cases
+    # e.g. SEARCH:::KJV:::love, or SEARCH:::love to search the main bible
+    def parseSearchCommand(self, textCommand):
+        command = re.match("^SEARCH:::(?:([^:_]+?):::)?(.+?)$", textCommand, re.IGNORECASE)
+        if not command:
+            return None
+        text, search = command.groups()
+        if text is None:
+            text = config.mainText
+        verses = searchVerses(text, search)
+        if verses is None:
+            return None
+        # words found are highlighted
+        for word in [re.escape(word) for word in search.split("%") if word]:
+            verses = [(b, c, v, re.sub("({0})".format(word), r"<z>\1</z>", scripture, flags=re.IGNORECASE)) for b, c, v, scripture in verses]
+        content = "<p>SEARCH:::<span style='color: brown;'>{0}</span>:::{1}</p><p>x <b style='color: brown;'>{2}</b> verse(s)</p><p>{3}</p>".format(text, search, len(verses), multipleVersesHtml(verses))
+        self.textCommandParser.lastKeyword = "search"
+        return ("study", content)
+
+    # a cached page is valid only as long as all settings affecting its rendering are unchanged
+    def getPageKey(self, textCommand, source):
+        if not (self.isInstantCommand(textCommand, source) or (source in ("main", "study") and not textCommand.startswith("_"))):
+            return None
+        # bible references, e.g. "John 3:16", are keyed by verse ids
+        verse = verseReferenceToBCV(textCommand)
+        if verse is not None:
+            textCommand = encodeVerseId(*verse)
+        # commands without a reference, e.g. TEXT:::KJV, are resolved against the active verses; instant commands carry their targets
+        activeVerses = ()
+        if verse is None and not textCommand.startswith("_"):
+            bookNamePattern = getBookNamePattern(getBibleVerseParser())
+            if bookNamePattern is None or not bookNamePattern.search(textCommand):
+                activeVerses = tuple([self.getVerseId(view) for view in ("main", "study", "commentary")])
+        # settings which decide the view a command opens in, or default modules and search strings the parser uses
+        return (textCommand, activeVerses, source, config.mainText, config.studyText, config.commentaryText, config.iSearchVersion,
+                config.openBibleInMainViewOnly, config.instantInformationEnabled, config.extractParallel,
+                config.topic, config.dictionary, config.encyclopedia, config.book, config.thirdDictionary,
+                config.bookSearchString, config.noteSearchString,
+                config.fontSize, config.readFormattedBibles, config.addTitleToPlainChapter, config.hideLexicalEntryInBible,
+                config.parserStandarisation, config.defaultLexiconStrongH, config.defaultLexiconStrongG, config.defaultLexiconETCBC,
+                config.defaultLexiconLXX, config.defaultLexiconGK, config.defaultLexiconLN, tuple(config.rtlTexts))
+
+    # active texts and verses, which are updated by the parser as a side-effect of running a command
+    def getViewState(self):
+        viewState = {}
+        for view in ("main", "study", "commentary"):
+            viewState["{0}Text".format(view)] = getattr(config, "{0}Text".format(view))
+            viewState[view] = self.getVerseId(view)
+        return viewState
+
+    def restoreViewState(self, stateChanges):
+        for item, value in stateChanges.items():
+            if item in ("main", "study", "commentary"):
+                self.setVerseId(item, value)
+            else:
+                setattr(config, item, value)
+
+    # active verses are kept in config as separate numbers, e.g. config.mainB, config.mainC and config.mainV
+    def getVerseId(self, view):
+        return encodeVerseId(getattr(config, "{0}B".format(view)), getattr(config, "{0}C".format(view)), getattr(config, "{0}V".format(view)))
+
+    def setVerseId(self, view, verseId):
+        b, c, v = decodeVerseId(verseId)
+        setattr(config, "{0}B".format(view), b)
+        setattr(config, "{0}C".format(view), c)
+        setattr(config, "{0}V".format(view), v)
 
-    def convertCrLink(self, match):
-        value = match.group()
-        bookNo = Converter().convertMyBibleBookNo(int(re.sub('onclick=[{0}"]cr\(([0-9]+?),[ ]*?[0-9]+?,[ ]*?[0-9]+?\)[{0}"]'.format("'"), r'\1', value)))
-        return re.sub('onclick=[{0}"]cr\([0-9]+?,[ ]*?([0-9]+?),[ ]*?([0-9]+?)\)[{0}"]'.format("'"), r'onclick="bcv({0},\1,\2)" onmouseover="imv({0},\1,\2)"'.format(bookNo), value)
+    def updateRefButtons(self):
+        self.updateMainRefButton()
+        self.updateStudyRefButton()
+        self.updateCommentaryRefButton()
+
+    # remove cached pages after saving notes
+    def clearPageCache(self):
+        self.pageCache.clear()
+        self.prefetchCache.clear()
+        self.instantCache.clear()
+        self.lexiconCache.clear()
+
+    # remove cached pages and indexes of modules after installing or importing modules
+    def clearModuleCache(self):
+        self.clearPageCache()
+        self.databases.closeModules()
+        bibleTables.clear()
+        versificationIndexes.clear()
+        crossReferenceIndexes.clear()
+
+    # render chapters next to the one opened on main view, while the app is idle
+    # then prepare lexical entries of words in the opened chapter, so that hovering them needs no database lookup
+    def startPrefetch(self, html=""):
+        # adjacent chapters are listed when prefetching starts
+        self.prefetchQueue = None
+        # all words of the chapter are queued; entries of earlier chapters are kept until they are replaced, as least recently used
+        self.lexiconQueue = getLexiconCommands(html)
+        self.lexiconQueueSize = 0
+        if config.prefetchChapterDepth > 0 or self.lexiconQueue:
+            self.prefetchTimer.start(500)
+
+    def prefetchNext(self):
+        if self.prefetchQueue is None:
+            self.prefetchQueue = self.getAdjacentChapterCommands()
+        if self.prefetchQueue:
+            verseId, readFormattedBibles = self.prefetchQueue.pop(0)
+            self.prefetchTextCommand(self.bcvToVerseReference(*decodeVerseId(verseId)), readFormattedBibles)
+        elif self.lexiconQueue:
+            textCommand = self.lexiconQueue.pop(0)
+            pageKey = self.getPageKey(textCommand, "main")
+            size = self.lexiconCache.touch(pageKey)
+            if size is None:
+                self.renderInAdvance(textCommand, self.lexiconCache)
+                size = self.lexiconCache.touch(pageKey) or 0
+            self.lexiconQueueSize += size
+            # further entries would only replace those prepared for this chapter
+            if self.lexiconQueueSize >= self.lexiconCache.maxSize:
+                self.lexiconQueue = []
+        if self.prefetchQueue or self.lexiconQueue:
+            self.prefetchTimer.start(0)
+        else:
+            # buttons are updated once, after all pages are prepared
+            self.updateRefButtons()
+
+    # first verses of chapters next to the one opened on main view
+    def getAdjacentChapterCommands(self):
+        commands = []
+        verseId = self.getVerseId("main")
+        for depth in range(1, config.prefetchChapterDepth + 1):
+            for chapterId in (chapterVerseId(verseId, depth), chapterVerseId(verseId, -depth)):
+                b, c, v = decodeVerseId(chapterId)
+                if b == config.mainB and self.hasMainChapter(c):
+                    # prepare pages in both plain and formatted modes
+                    commands.append((chapterId, config.readFormattedBibles))
+                    commands.append((chapterId, not config.readFormattedBibles))
+        return commands
+
+    def prefetchTextCommand(self, textCommand, readFormattedBibles):
+        currentReadFormattedBibles = config.readFormattedBibles
+        config.readFormattedBibles = readFormattedBibles
+        try:
+            self.renderInAdvance(textCommand, self.prefetchCache)
+        finally:
+            config.readFormattedBibles = currentReadFormattedBibles
+
+    def renderInAdvance(self, textCommand, pageCache):
+        pageKey = self.getPageKey(textCommand, "main")
+        if not (pageKey in self.pageCache or pageKey in self.instantCache or pageKey in pageCache):
+            stateBefore = self.getViewState()
+            lastKeyword = self.textCommandParser.lastKeyword
+            try:
+                view, content, html, page = self.parseTextCommand(textCommand, "main")
+                if page is not None:
+                    pageCache.set(pageKey, page, sys.getsizeof(html))
+            except Exception:
+                # a page which fails to render is not prepared; prefetching goes on with the next one
+                print("Failed to prepare '{0}' in advance.".format(textCommand))
+                traceback.print_exc()
+            finally:
+                # prefetching must not change the active texts and verses
+                self.restoreViewState(stateBefore)
+                self.textCommandParser.lastKeyword = lastKeyword
 
     # add a history record
     def addHistoryRecord(self, view, textCommand):
@@ -2396,9 +2851,7 @@ class WebEngineView(QWebEngineView):
 
     def updateContextMenu(self):
         text = self.getText()
-        parser = BibleVerseParser(config.parserStandarisation)
-        book = parser.bcvToVerseReference(self.getBook(), 1, 1)[:-4]
-        del parser
+        book = bcvToVerseReference(self.getBook(), 1, 1)[:-4]
         self.searchText.setText("Search in {0}".format(text))
         self.searchTextInBook.setText("Search in {0} > {1}".format(text, book))
         self.iSearchText.setText("Search with {1} in {0}".format(text, config.iSearchVersion))
@@ -2518,7 +2971,7 @@ class WebEngineView(QWebEngineView):
         if not self.selectedText():
             self.messageNoSelection()
         else:
-            self.page().triggerAction(self.page().Copy)
+            self.parent.parent.completeHtmlStream(self.name, lambda: self.page().triggerAction(self.page().Copy))
 
     def textToSpeech(self):
         if not self.selectedText():
@@ -2612,17 +3065,19 @@ class WebEngineView(QWebEngineView):
             self.parent.parent.textCommandChanged(searchCommand, self.name)
 
     def extractAllReferences(self):
-        selectedText = self.selectedText()
-        parser = BibleVerseParser(config.parserStandarisation)
-        verseList = parser.extractAllReferences(selectedText, False, True)
-        del parser
+        # selection is read from the page, after it is extended to the rest of a streamed page
+        self.parent.parent.completeHtmlStream(self.name, lambda: self.page().runJavaScript("window.getSelection().toString()", self.extractReferencesInText))
+
+    def extractReferencesInText(self, selectedText):
+        verseList = extractReferences(selectedText, False, True)
         if not verseList:
             self.page().runJavaScript("alert('No bible verse reference is found from the text you selected.')")
         else:
-            biblesSqlite = BiblesSqlite()
-            verses = biblesSqlite.readMultipleVerses(self.getText(), verseList)
-            del biblesSqlite
-            self.openPopover(html=verses)
+            verses = readMultipleVerses(self.getText(), verseList)
+            if verses is None:
+                self.page().runJavaScript("alert('Bible verses cannot be read from {0}.')".format(self.getText()))
+            else:
+                self.openPopover(html=multipleVersesHtml(verses))
 
     def runAsCommand(self):
         selectedText = self.selectedText()
@@ -3164,12 +3619,11 @@ class NoteEditor(QMainWindow):
 
     # load chapter / verse notes from sqlite database
     def openBibleNote(self):
-        noteSqlite = NoteSqlite()
+        noteSqlite = self.parent.databases.notes()
         if self.noteType == "chapter":
             note = noteSqlite.getChapterNote((self.b, self.c))
         elif self.noteType == "verse":
             note = noteSqlite.getVerseNote((self.b, self.c, self.v))
-        del noteSqlite
         #self.editor.setPlainText(note)
         self.editor.setHtml(note)
 
@@ -3228,16 +3682,18 @@ class NoteEditor(QMainWindow):
         else:
             note = self.editor.toPlainText()
         if self.noteType == "chapter":
-            noteSqlite = NoteSqlite()
+            noteSqlite = self.parent.databases.notes()
             noteSqlite.saveChapterNote((self.b, self.c, note))
-            del noteSqlite
+            self.parent.databases.noteIndex().updateChapter(self.b, self.c)
+            self.parent.clearPageCache()
             self.parent.openChapterNote(self.b, self.c)
             self.parent.noteSaved = True
             self.updateWindowTitle()
         elif self.noteType == "verse":
-            noteSqlite = NoteSqlite()
+            noteSqlite = self.parent.databases.notes()
             noteSqlite.saveVerseNote((self.b, self.c, self.v, note))
-            del noteSqlite
+            self.parent.databases.noteIndex().updateVerse(self.b, self.c, self.v)
+            self.parent.clearPageCache()
             self.parent.openVerseNote(self.b, self.c, self.v)
             self.parent.noteSaved = True
             self.updateWindowTitle()
@@ -3552,3 +4008,1428 @@ class Downloader(QDialog):
         else:
             if interactWithParent:
                 self.parent.moduleInstalledFailed(self.filename)
+
+
+class TaggingProgress(QDialog):
+
+    def __init__(self, parent, files, manifest=None):
+        super().__init__()
+        self.parent = parent
+        self.manifest = manifest
+        self.setWindowTitle("Tagging References")
+        self.setModal(True)
+        self.files = files
+        self.completed = 0
+        self.failedFiles = []
+        self.taggedSize = 0
+        self.startTime = time.perf_counter()
+
+        self.setupLayout()
+
+        # with a manifest, workers hash files as they read them, and skip those of which content is not changed
+        fileArguments = {fileName: (True, manifest.getKnownHash(fileName)) for fileName in files} if manifest is not None else None
+        self.processPool = FileProcessPool(files, config.taggingProcesses, tagFileInProcess, config.parserStandarisation, fileArguments=fileArguments)
+        self.processPool.fileProcessed.connect(self.fileTagged)
+        self.processPool.start()
+
+    def setupLayout(self):
+        self.message = QLabel("Tagging {0} file(s) ...".format(len(self.files)))
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setMinimum(0)
+        self.progressBar.setMaximum(len(self.files))
+        self.progressBar.setValue(0)
+
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.clicked.connect(self.reject)
+
+        self.layout = QGridLayout()
+        self.layout.addWidget(self.message, 0, 0)
+        self.layout.addWidget(self.progressBar, 1, 0)
+        self.layout.addWidget(self.cancelButton, 2, 0)
+        self.setLayout(self.layout)
+
+    def fileTagged(self, fileName, error, result):
+        self.completed += 1
+        if error:
+            self.failedFiles.append(fileName)
+        else:
+            size, duration, fileStatus = result
+            self.taggedSize += size
+            if self.manifest is not None:
+                self.manifest.update(fileName, fileStatus)
+        self.progressBar.setValue(self.completed)
+        self.message.setText("Tagged {0} of {1} file(s): {2}".format(self.completed, len(self.files), os.path.basename(fileName)))
+        if self.completed == len(self.files):
+            if self.manifest is not None:
+                self.manifest.save()
+            self.accept()
+            if self.failedFiles:
+                self.parent.displayNotice(("Tagging References", "Failed to tag:\n{0}".format("\n".join(self.failedFiles))))
+            else:
+                self.parent.onTaggingCompleted(self.taggedSize / 1048576 / (time.perf_counter() - self.startTime))
+
+    # files which are not started yet are not tagged
+    def reject(self):
+        self.processPool.cancel()
+        if self.manifest is not None:
+            self.manifest.save()
+        super().reject()
+
+
+class ImportProgress(QDialog):
+
+    def __init__(self, parent, files):
+        super().__init__()
+        self.parent = parent
+        self.setWindowTitle("Importing 3rd Party Modules")
+        self.setModal(True)
+        self.files = files
+        self.completed = 0
+        self.failedFiles = []
+
+        self.setupLayout()
+
+        importSettings = {key: getattr(config, key) for key in ("importAddVerseLinebreak", "importDoNotStripStrongNo", "importDoNotStripMorphCode", "importRtlOT")}
+        self.processPool = FileProcessPool(files, config.importProcesses, importModuleInProcess, importSettings)
+        self.processPool.fileProcessed.connect(self.moduleImported)
+        self.processPool.start()
+
+    def setupLayout(self):
+        self.message = QLabel("Importing {0} module(s) ...".format(len(self.files)))
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setMinimum(0)
+        self.progressBar.setMaximum(len(self.files))
+        self.progressBar.setValue(0)
+
+        self.results = QTextEdit()
+        self.results.setReadOnly(True)
+
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.clicked.connect(self.reject)
+
+        self.layout = QGridLayout()
+        self.layout.addWidget(self.message, 0, 0)
+        self.layout.addWidget(self.progressBar, 1, 0)
+        self.layout.addWidget(self.results, 2, 0)
+        self.layout.addWidget(self.cancelButton, 3, 0)
+        self.setLayout(self.layout)
+
+    def moduleImported(self, fileName, error, result):
+        self.completed += 1
+        *_, name = os.path.split(fileName)
+        if error:
+            self.failedFiles.append(fileName)
+            self.results.append("Failed: {0} ({1})".format(name, error))
+        else:
+            self.results.append("Imported: {0}".format(name))
+        self.progressBar.setValue(self.completed)
+        self.message.setText("Imported {0} of {1} module(s); {2} failed.".format(self.completed, len(self.files), len(self.failedFiles)))
+        if self.completed == len(self.files):
+            self.parent.clearModuleCache()
+            # results are kept on screen, in case of failures
+            self.cancelButton.setText("Close")
+            if not self.failedFiles:
+                self.accept()
+                self.parent.mainPage.runJavaScript("alert('Multiple 3rd party modules imported.')")
+
+    # modules which are not started yet are not imported
+    def reject(self):
+        self.processPool.cancel()
+        if self.completed:
+            self.parent.clearModuleCache()
+        super().reject()
+
+
+# verses are identified internally by packed integers, b << 16 | c << 8 | v
+# ids compare in canonical order, e.g. a verse range is simply firstVerseId <= verseId <= lastVerseId
+def encodeVerseId(b, c, v):
+    return (b << 16) | (c << 8) | v
+
+def decodeVerseId(verseId):
+    return (verseId >> 16, (verseId >> 8) & 255, verseId & 255)
+
+# id of the first verse of the chapter offset chapters after the chapter of verseId; the book changes when it runs out of 1 to 255
+def chapterVerseId(verseId, offset=0):
+    return (((verseId >> 8) + offset) << 8) | 1
+
+# id of html element of a verse, e.g. "v1.1.1"
+def verseElementId(verseId):
+    return "v{0}.{1}.{2}".format(*decodeVerseId(verseId))
+
+
+bibleVerseParsers = {}
+
+# one parser for each standardisation setting, shared by all actions on the gui thread
+def getBibleVerseParser(standarisation=None):
+    if standarisation is None:
+        standarisation = config.parserStandarisation
+    if not standarisation in bibleVerseParsers:
+        bibleVerseParsers[standarisation] = BibleVerseParser(standarisation)
+    return bibleVerseParsers[standarisation]
+
+bookNamePatterns = {}
+
+# one pass over a text finds places where a reference may start: a book name or abbreviation, followed by a number
+# book names are compiled into a trie, so that the pattern does not try every name at every position
+def getBookNamePattern(parser):
+    bookNames = getattr(parser, "bibleBooksDict", None)
+    if not bookNames:
+        return None
+    if not id(bookNames) in bookNamePatterns:
+        bookNamePatterns[id(bookNames)] = re.compile("(?:{0})\\.?\\s*[0-9]".format(trieRegex(bookNames.keys())), re.IGNORECASE)
+    return bookNamePatterns[id(bookNames)]
+
+def trieRegex(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for character in word:
+            node = node.setdefault(character, {})
+        # an empty key marks the end of a word
+        node[""] = {}
+    return trieNodeRegex(trie)
+
+def trieNodeRegex(node):
+    alternatives = [re.escape(character) + trieNodeRegex(child) for character, child in sorted(node.items()) if character]
+    if not alternatives:
+        return ""
+    if len(alternatives) == 1 and not "" in node:
+        return alternatives[0]
+    return "(?:{0}){1}".format("|".join(alternatives), "?" if "" in node else "")
+
+# same as BibleVerseParser.parseText, but only lines in which book names are found are passed to the parser, all in one call
+def parseReferences(text, parser=None):
+    if parser is None:
+        parser = getBibleVerseParser()
+    bookNamePattern = getBookNamePattern(parser)
+    if bookNamePattern is None:
+        return parser.parseText(text)
+    # lines are at even positions, line breaks at odd positions
+    lines = re.split("(\n|<br>)", text)
+    found = [i for i in range(0, len(lines), 2) if bookNamePattern.search(lines[i])]
+    if not found:
+        return text
+    parsedLines = parser.parseText("\n".join([lines[i] for i in found])).split("\n")
+    if len(parsedLines) != len(found):
+        return parser.parseText(text)
+    for i, parsedLine in zip(found, parsedLines):
+        lines[i] = parsedLine
+    return "".join(lines)
+
+# same as BibleVerseParser.extractAllReferences, but only lines in which book names are found are passed to the parser
+def extractReferences(text, *args):
+    # a single formatted reference, e.g. from reference buttons and features, is looked up without parsing
+    if not (args and args[0]):
+        bcv = verseReferenceToBCV(text.strip())
+        if bcv is not None:
+            return [bcv]
+    parser = getBibleVerseParser()
+    bookNamePattern = getBookNamePattern(parser)
+    if bookNamePattern is None:
+        return parser.extractAllReferences(text, *args)
+    lines = [line for line in re.split("\n|<br>", text) if bookNamePattern.search(line)]
+    if not lines:
+        return []
+    return parser.extractAllReferences("\n".join(lines), *args)
+
+# references found in a collection of documents, for statistics; requires numpy
+# returns packed verse ids and offsets; references of document i are verseIds[offsets[i]:offsets[i + 1]]
+def extractReferencesInBulk(documents):
+    if not isNumpyInstalled:
+        raise ImportError("numpy is required for extracting references in bulk.")
+    verseIds = array("L")
+    offsets = array("L", [0])
+    for document in documents:
+        verseIds.extend([encodeVerseId(*verse[:3]) for verse in extractReferences(document, False)])
+        offsets.append(len(verseIds))
+    return (numpy.array(verseIds, dtype=numpy.uint32), numpy.array(offsets, dtype=numpy.int64))
+
+# number of references to each book, indexed by book number
+def countReferencesByBook(verseIds):
+    return numpy.bincount(verseIds >> 16, minlength=67)
+
+# packed chapter ids, c | b << 8, and number of references to each of them
+def countReferencesByChapter(verseIds):
+    return numpy.unique(verseIds >> 8, return_counts=True)
+
+# number of documents referring to both books b1 and b2 at [b1, b2]; [b, b] is the number of documents referring to book b
+# documents are counted in blocks, so that memory used does not grow with the number of documents
+def countBookCoOccurrences(verseIds, offsets, blockSize=16384):
+    books = (verseIds >> 16).astype(numpy.int64)
+    numberOfBooks = max(67, int(books.max(initial=0)) + 1)
+    numberOfDocuments = len(offsets) - 1
+    # floating point matrices are multiplied much faster; counts are exact below 2 ** 53
+    counts = numpy.zeros((numberOfBooks, numberOfBooks))
+    for start in range(0, numberOfDocuments, blockSize):
+        end = min(start + blockSize, numberOfDocuments)
+        documents = numpy.repeat(numpy.arange(end - start), numpy.diff(offsets[start:end + 1]))
+        presence = numpy.zeros((end - start, numberOfBooks))
+        presence[documents, books[offsets[start]:offsets[end]]] = 1
+        counts += presence.T @ presence
+    return counts.astype(numpy.int64)
+
+verseReferences = {}
+
+# convert bible references to string; results are remembered, for at most one entry per verse and setting
+def bcvToVerseReference(b, c, v):
+    key = (config.parserStandarisation, encodeVerseId(b, c, v))
+    if not key in verseReferences:
+        referenceTable = getReferenceTable()
+        verseReference = referenceTable.getReference(b, c, v) if referenceTable is not None else None
+        if verseReference is None:
+            verseReference = getBibleVerseParser().bcvToVerseReference(b, c, v)
+        verseReferences[key] = verseReference
+    return verseReferences[key]
+
+# convert formatted references, e.g. "Gen 1:1", to (b, c, v); None if the reference is not found in table
+def verseReferenceToBCV(verseReference):
+    referenceTable = getReferenceTable()
+    if referenceTable is not None:
+        verseId = referenceTable.getVerseId(verseReference)
+        if verseId is not None:
+            return decodeVerseId(verseId)
+    return None
+
+# compare formatting references with a new parser for every call, a shared parser, and remembered results, e.g. python3 -c "import gui; gui.benchmarkVerseReferences()"
+def benchmarkVerseReferences(calls=2000):
+    verses = [(b, c, 1) for b in range(1, 67) for c in range(1, 4)]
+    verses = (verses * (calls // len(verses) + 1))[:calls]
+    results = {}
+    verseReferences.clear()
+    for mode in ("new parser", "shared parser", "remembered"):
+        start = time.perf_counter()
+        for b, c, v in verses:
+            if mode == "new parser":
+                parser = BibleVerseParser(config.parserStandarisation)
+                parser.bcvToVerseReference(b, c, v)
+                del parser
+            elif mode == "shared parser":
+                getBibleVerseParser().bcvToVerseReference(b, c, v)
+            else:
+                bcvToVerseReference(b, c, v)
+        duration = (time.perf_counter() - start) / calls
+        results[mode] = duration
+        print("{0}: {1} calls, {2:.1f}us per call".format(mode, calls, duration * 1000000))
+    print("speedup: {0:.2f}x".format(results["new parser"] / results["remembered"]))
+    return results
+
+
+# formatted references of all verses, sorted by verse ids
+# references are stored one after another in a utf-8 encoded string, referenceOffsets[i] being the start of the i-th one
+class ReferenceTable:
+
+    def __init__(self, verseIds, referenceOffsets, references):
+        self.verseIds = verseIds
+        self.referenceOffsets = referenceOffsets
+        self.references = references
+        self.verseIdsByReference = None
+
+    def getReference(self, b, c, v):
+        verseId = encodeVerseId(b, c, v)
+        index = bisect_left(self.verseIds, verseId)
+        if index < len(self.verseIds) and self.verseIds[index] == verseId:
+            return self.references[self.referenceOffsets[index]:self.referenceOffsets[index + 1]].decode("utf-8")
+        return None
+
+    def getVerseId(self, verseReference):
+        if self.verseIdsByReference is None:
+            references = [self.references[start:end].decode("utf-8") for start, end in zip(self.referenceOffsets, self.referenceOffsets[1:])]
+            self.verseIdsByReference = dict(zip(references, self.verseIds))
+        return self.verseIdsByReference.get(verseReference, None)
+
+    def save(self, fileName):
+        saveIndexFile(fileName, self.write)
+
+    def write(self, fileObject):
+        array("L", [int(config.version * 100), len(self.verseIds), len(self.references)]).tofile(fileObject)
+        self.verseIds.tofile(fileObject)
+        self.referenceOffsets.tofile(fileObject)
+        fileObject.write(self.references)
+
+
+referenceTables = {}
+
+# lookup tables are generated once for each standardisation setting, and loaded from file afterwards
+def getReferenceTable():
+    standarisation = config.parserStandarisation
+    if not standarisation in referenceTables:
+        fileName = os.path.join("marvelData", "references_{0}.idx".format(standarisation))
+        referenceTable = loadReferenceTable(fileName)
+        if referenceTable is None:
+            referenceTable = createReferenceTable()
+            if referenceTable is not None:
+                referenceTable.save(fileName)
+        referenceTables[standarisation] = referenceTable
+    return referenceTables[standarisation]
+
+def loadReferenceTable(fileName):
+    if not os.path.isfile(fileName):
+        return None
+    try:
+        with open(fileName, "rb") as fileObject:
+            header = array("L")
+            header.fromfile(fileObject, 3)
+            version, numberOfVerses, size = header
+            # tables generated by other versions of the app are generated again
+            if version != int(config.version * 100):
+                return None
+            verseIds = array("L")
+            verseIds.fromfile(fileObject, numberOfVerses)
+            referenceOffsets = array("L")
+            referenceOffsets.fromfile(fileObject, numberOfVerses + 1)
+            references = fileObject.read(size)
+    except (EOFError, OSError, ValueError):
+        # files not completely written are generated again
+        return None
+    if len(references) != size:
+        return None
+    return ReferenceTable(verseIds, referenceOffsets, references)
+
+def createReferenceTable():
+    versificationIndex = getVersificationIndex("KJV") or getVersificationIndex(config.mainText)
+    if versificationIndex is None:
+        return None
+    parser = getBibleVerseParser()
+    verseIds = array("L")
+    referenceOffsets = array("L", [0])
+    references = bytearray()
+    for b in range(1, len(versificationIndex.chapterCounts)):
+        for c in versificationIndex.getChapterList(b):
+            for v in range(1, versificationIndex.getVerseCount(b, c) + 1):
+                verseIds.append(encodeVerseId(b, c, v))
+                references += parser.bcvToVerseReference(b, c, v).encode("utf-8")
+                referenceOffsets.append(len(references))
+    return ReferenceTable(verseIds, referenceOffsets, bytes(references))
+
+
+# number of verses in each chapter of a bible, kept in flat arrays
+class VersificationIndex:
+
+    def __init__(self, chapterVerses):
+        # chapterVerses: (book, chapter, number of verses), sorted by book and chapter
+        # rows of introductions, e.g. chapter 0, are not chapters; they would be stored in place of the last chapter of the previous book
+        chapterVerses = [(b, c, verses) for b, c, verses in chapterVerses if b > 0 and c > 0 and verses]
+        lastBook = max([b for b, *_ in chapterVerses], default=0)
+        self.chapterCounts = array("H", [0] * (lastBook + 1))
+        for b, c, *_ in chapterVerses:
+            self.chapterCounts[b] = max(self.chapterCounts[b], c)
+        # verse counts of chapter c of book b are stored at position chapterOffsets[b] + c - 1
+        self.chapterOffsets = array("L", [0] * (lastBook + 1))
+        offset = 0
+        for b in range(lastBook + 1):
+            self.chapterOffsets[b] = offset
+            offset += self.chapterCounts[b]
+        self.verseCounts = array("H", [0] * offset)
+        for b, c, verses in chapterVerses:
+            self.verseCounts[self.chapterOffsets[b] + c - 1] = verses
+
+    def getChapterList(self, b):
+        if not 0 < b < len(self.chapterCounts):
+            return []
+        offset = self.chapterOffsets[b]
+        return [c for c in range(1, self.chapterCounts[b] + 1) if self.verseCounts[offset + c - 1]]
+
+    def getVerseCount(self, b, c):
+        if 0 < b < len(self.chapterCounts) and 0 < c <= self.chapterCounts[b]:
+            return self.verseCounts[self.chapterOffsets[b] + c - 1]
+        return 0
+
+    def hasChapter(self, b, c):
+        return self.getVerseCount(b, c) > 0
+
+    def isValidVerse(self, b, c, v):
+        return 0 < v <= self.getVerseCount(b, c)
+
+
+versificationIndexes = {}
+
+# versification of a bible module, loaded once with a single query
+def getVersificationIndex(text):
+    database, table = getBibleTable(text)
+    if database is None:
+        return None
+    if not (database, table) in versificationIndexes:
+        connection, lock = databaseConnections.module(database)
+        try:
+            with lock:
+                chapterVerses = connection.execute("SELECT Book, Chapter, MAX(Verse) FROM {0} GROUP BY Book, Chapter ORDER BY Book, Chapter".format(table)).fetchall()
+        except sqlite3.Error:
+            return None
+        versificationIndexes[(database, table)] = VersificationIndex(chapterVerses)
+    return versificationIndexes[(database, table)]
+
+
+bibleTables = {}
+
+# database file and table of a bible module: table Verses of a formatted bible, or a table of plain bibles in bibles.sqlite
+# plain bibles are preferred when formatted bibles are not read, i.e. config.readFormattedBibles is False
+def getBibleTable(text):
+    key = (text, config.readFormattedBibles)
+    if not key in bibleTables:
+        tables = []
+        database = os.path.join("marvelData", "bibles", "{0}.bible".format(text))
+        if os.path.isfile(database):
+            tables.append((database, "Verses"))
+        database = os.path.join("marvelData", "bibles.sqlite")
+        if os.path.isfile(database) and re.match("^[A-Za-z0-9_]+$", text):
+            connection, lock = databaseConnections.module(database)
+            try:
+                with lock:
+                    found = connection.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (text,)).fetchone()
+            except sqlite3.Error:
+                found = None
+            if found:
+                tables.append((database, text))
+        if not config.readFormattedBibles:
+            tables.reverse()
+        bibleTables[key] = tables[0] if tables else (None, None)
+    return bibleTables[key]
+
+# names of installed bibles, formatted and plain, in alphabetical order
+def getBibleList():
+    folder = os.path.join("marvelData", "bibles")
+    texts = {os.path.splitext(file)[0] for file in os.listdir(folder) if file.endswith(".bible")} if os.path.isdir(folder) else set()
+    database = os.path.join("marvelData", "bibles.sqlite")
+    if os.path.isfile(database):
+        connection, lock = databaseConnections.module(database)
+        try:
+            with lock:
+                texts.update([name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type='table' AND sql LIKE '%Scripture%'")])
+        except sqlite3.Error:
+            pass
+    return sorted(texts)
+
+moduleReadThreadPool = None
+
+# read verses from several bibles at the same time, one thread for each bible, so that it takes as long as the slowest one
+# returns (text, verses) in the order of texts, or None if a bible cannot be read
+def readBiblesConcurrently(texts, verseList):
+    global moduleReadThreadPool
+    if moduleReadThreadPool is None:
+        moduleReadThreadPool = ThreadPoolExecutor(max_workers=config.moduleReadThreads)
+    # modules in the same file, e.g. plain bibles in bibles.sqlite, take turns on its connection
+    futures = [(text, moduleReadThreadPool.submit(readMultipleVerses, text, verseList)) for text in texts]
+    bibles = [(text, future.result()) for text, future in futures]
+    if None in [verses for text, verses in bibles]:
+        return None
+    return bibles
+
+# each verse, followed by its text in all compared bibles; verses are listed in the order of references
+def compareVersesHtml(bibles):
+    verses = OrderedDict()
+    for text, rows in bibles:
+        for b, c, v, scripture in rows:
+            verses.setdefault((b, c, v), []).append((text, scripture))
+    return "".join(["<h2><ref onclick='bcv({0},{1},{2})'>{3}</ref></h2>{4}".format(b, c, v, bcvToVerseReference(b, c, v), "".join(["({0}) {1}<br>".format(text, scripture) for text, scripture in scriptures])) for (b, c, v), scriptures in verses.items()])
+
+# a chapter of all compared bibles, side by side, one row for each verse in canonical order
+def parallelVersesHtml(b, c, bibles):
+    scriptures = [{(b, c, v): scripture for b, c, v, scripture in rows} for text, rows in bibles]
+    verses = sorted(set().union(*scriptures))
+    html = "<h2>{0}</h2><table><tr>{1}</tr>".format(bcvToVerseReference(b, c, 1)[:-2], "".join(["<th>{0}</th>".format(text) for text, rows in bibles]))
+    for verse in verses:
+        html += "<tr>{0}</tr>".format("".join(["<td style='vertical-align: top;'><ref onclick='bcv({0},{1},{2})'><sup>{2}</sup></ref> {3}</td>".format(*verse, bible.get(verse, "")) for bible in scriptures]))
+    return html + "</table>"
+
+# read verses of a bible with a single query, in the order of verseList, without repeated verses
+# verseList items are (b, c, v), (b, c, v, v2) or (b, c, v, c2, v2)
+def readMultipleVerses(text, verseList):
+    database, table = getBibleTable(text)
+    versificationIndex = getVersificationIndex(text)
+    if versificationIndex is None:
+        return None
+    verseIds = []
+    for b, c, v, *verseRange in verseList:
+        if not verseRange:
+            verseIds.append(encodeVerseId(b, c, v))
+        else:
+            c2, v2 = (c, verseRange[0]) if len(verseRange) == 1 else verseRange
+            for chapter in range(c, c2 + 1):
+                firstVerse = v if chapter == c else 1
+                lastVerse = v2 if chapter == c2 else versificationIndex.getVerseCount(b, chapter)
+                verseIds += [encodeVerseId(b, chapter, verse) for verse in range(firstVerse, lastVerse + 1)]
+    verseIds = list(OrderedDict.fromkeys(verseIds))
+    connection, lock = databaseConnections.module(database)
+    try:
+        # the transaction is committed, so that the open connection keeps no lock on the file
+        with lock, connection:
+            # requested verses are joined on Book, Chapter and Verse, so that the query can look them up instead of computing ids of every row
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS VerseList (Position INTEGER PRIMARY KEY, Book INT, Chapter INT, Verse INT)")
+            connection.execute("DELETE FROM VerseList")
+            connection.executemany("INSERT INTO VerseList VALUES (?, ?, ?, ?)", [(position, *decodeVerseId(verseId)) for position, verseId in enumerate(verseIds)])
+            query = "SELECT VerseList.Book, VerseList.Chapter, VerseList.Verse, {0}.Scripture FROM VerseList CROSS JOIN {0} ON {0}.Book = VerseList.Book AND {0}.Chapter = VerseList.Chapter AND {0}.Verse = VerseList.Verse ORDER BY VerseList.Position".format(table)
+            verses = connection.execute(query).fetchall()
+    except sqlite3.Error:
+        return None
+    # the first row of each verse, as with lookups of single verses
+    scriptures = OrderedDict()
+    for b, c, v, scripture in verses:
+        scriptures.setdefault((b, c, v), scripture)
+    return [(*verse, scripture) for verse, scripture in scriptures.items()]
+
+# verses read by readMultipleVerses, each after a link to its reference
+def multipleVersesHtml(verses):
+    return "".join(["(<ref onclick='bcv({0},{1},{2})'>{3}</ref>) {4}<br>".format(b, c, v, bcvToVerseReference(b, c, v), scripture) for b, c, v, scripture in verses])
+
+
+# cross-references kept as compressed sparse rows:
+# targets of the verse at position i of sources are stored in targets[offsets[i]:offsets[i + 1]]
+# the same layout, with sources and targets swapped, answers which verses refer to a verse
+class CrossReferenceIndex:
+
+    def __init__(self, links, backlinks):
+        # links, backlinks: (sources, offsets, targets)
+        self.links = links
+        self.backlinks = backlinks
+
+    def getTargets(self, verseId):
+        return self.lookup(self.links, verseId)
+
+    def getSources(self, verseId):
+        return self.lookup(self.backlinks, verseId)
+
+    def lookup(self, rows, verseId):
+        sources, offsets, targets = rows
+        index = bisect_left(sources, verseId)
+        if index < len(sources) and sources[index] == verseId:
+            return targets[offsets[index]:offsets[index + 1]].tolist()
+        return []
+
+    def save(self, fileName):
+        saveIndexFile(fileName, self.write)
+
+    def write(self, fileObject):
+        header = [int(config.version * 100)]
+        for sources, offsets, targets in (self.links, self.backlinks):
+            header += [len(sources), len(targets)]
+        array("L", header).tofile(fileObject)
+        for rows in (self.links, self.backlinks):
+            for values in rows:
+                array("L", values).tofile(fileObject)
+
+
+crossReferenceIndexes = {}
+
+# indexes are generated once from cross-reference.sqlite in a background thread, and memory-mapped from file afterwards
+# returns None while an index is being generated, or when cross-reference data is not installed
+def getCrossReferenceIndex(table):
+    if not table in crossReferenceIndexes:
+        database = os.path.join("marvelData", "cross-reference.sqlite")
+        fileName = os.path.join("marvelData", "cross-reference_{0}.idx".format(table))
+        crossReferenceIndex = None
+        if os.path.isfile(database) and os.path.isfile(fileName) and os.path.getmtime(fileName) >= os.path.getmtime(database):
+            crossReferenceIndex = loadCrossReferenceIndex(fileName)
+        # None, while the index is built
+        crossReferenceIndexes[table] = crossReferenceIndex
+        if crossReferenceIndex is None and os.path.isfile(database):
+            threading.Thread(target=buildCrossReferenceIndex, args=(database, table, fileName, config.parserStandarisation), daemon=True).start()
+    return crossReferenceIndexes[table]
+
+# runs in a background thread, with a parser of its own
+def buildCrossReferenceIndex(database, table, fileName, standarisation):
+    crossReferenceIndex = createCrossReferenceIndex(database, table, BibleVerseParser(standarisation))
+    if crossReferenceIndex is not None:
+        crossReferenceIndex.save(fileName)
+        crossReferenceIndexes[table] = crossReferenceIndex
+
+def loadCrossReferenceIndex(fileName):
+    try:
+        with open(fileName, "rb") as fileObject:
+            data = mmap.mmap(fileObject.fileno(), 0, access=mmap.ACCESS_READ)
+        # files which are not completely written may end within a value
+        if len(data) % array("L").itemsize:
+            return None
+        values = memoryview(data).cast("L")
+    except (OSError, ValueError, TypeError):
+        return None
+    # indexes generated by other versions of the app, or not completely written, are generated again
+    if len(values) < 5 or values[0] != int(config.version * 100) or len(values) != 5 + sum([2 * values[i] + 1 + values[i + 1] for i in (1, 3)]):
+        return None
+    position = 5
+    rows = []
+    for numberOfSources, numberOfTargets in (values[1:3], values[3:5]):
+        sources = values[position:position + numberOfSources]
+        position += numberOfSources
+        offsets = values[position:position + numberOfSources + 1]
+        position += numberOfSources + 1
+        targets = values[position:position + numberOfTargets]
+        position += numberOfTargets
+        rows.append((sources, offsets, targets))
+    return CrossReferenceIndex(*rows)
+
+# cross-references of a single verse, in the order of the index
+def readCrossReferenceTargets(table, verseId):
+    connection, lock = databaseConnections.module(os.path.join("marvelData", "cross-reference.sqlite"))
+    try:
+        with lock:
+            records = connection.execute("SELECT Information FROM {0} WHERE Book=? AND Chapter=? AND Verse=?".format(table), decodeVerseId(verseId)).fetchall()
+    except sqlite3.Error:
+        return []
+    parser = getBibleVerseParser()
+    targets = [encodeVerseId(*verse[:3]) for information, *_ in records for verse in parser.extractAllReferences(information, False)]
+    return list(OrderedDict.fromkeys(targets))
+
+def createCrossReferenceIndex(database, table, parser):
+    connection = sqlite3.connect(database)
+    try:
+        records = connection.execute("SELECT Book, Chapter, Verse, Information FROM {0} ORDER BY Book, Chapter, Verse".format(table)).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+    links = []
+    for b, c, v, information in records:
+        verseId = encodeVerseId(b, c, v)
+        links += [(verseId, encodeVerseId(*verse[:3])) for verse in parser.extractAllReferences(information, False)]
+    links = list(OrderedDict.fromkeys(links))
+    # links keep the order of cross-references given by the data; backlinks are listed in canonical order
+    backlinks = sorted([(target, source) for source, target in links])
+    return CrossReferenceIndex(compressRows(links), compressRows(backlinks))
+
+# verses listed under the reference of verse b, c, v, with their text in a bible
+def crossReferenceHtml(b, c, v, verseIds, text):
+    verseList = [decodeVerseId(verseId) for verseId in verseIds]
+    verses = readMultipleVerses(text, verseList) if verseList else []
+    if verses is None:
+        verses = [(*verse, "") for verse in verseList]
+    return "<h2>{0}</h2>{1}".format(bcvToVerseReference(b, c, v), multipleVersesHtml(verses))
+
+# index files are written to a temporary file first, so that a crash while saving leaves no partial file behind
+def saveIndexFile(fileName, write):
+    temporaryFile = "{0}.{1}.tmp".format(fileName, threading.get_ident())
+    with open(temporaryFile, "wb") as fileObject:
+        write(fileObject)
+    os.replace(temporaryFile, fileName)
+
+# links: (source, target), sorted by source
+def compressRows(links):
+    sources = array("L")
+    offsets = array("L", [0])
+    targets = array("L")
+    for source, target in links:
+        if sources and sources[-1] == source:
+            offsets[-1] += 1
+        else:
+            sources.append(source)
+            offsets.append(offsets[-1] + 1)
+        targets.append(target)
+    return (sources, offsets, targets)
+
+
+# words of original-language texts are linked to lexical entries with lex('H7225'), and to instant word information with iw(1, 1)
+lexiconLinkPattern = re.compile(r"""\blex\(['"]([^'"]+)['"]\)|\biw\((\d+),\s*(\d+)\)""")
+
+def getLexiconCommands(html):
+    commands = []
+    for code, b, wordId in lexiconLinkPattern.findall(html):
+        if code:
+            commands.append("LEXICON:::{0}".format(code))
+        else:
+            commands.append("_instantWord:::{0}:{1}".format(b, wordId))
+    return list(OrderedDict.fromkeys(commands))
+
+
+# index files which are being built, or False for those which cannot be built, e.g. without trigram tokenizer
+searchIndexes = {}
+
+# trigram full-text index of a bible module, kept in a file next to the module, e.g. marvelData/bibles/KJV.search
+# module files are not changed, so that they can still be written by sqlite builds without fts5
+def getSearchIndexFile(database, table):
+    name = os.path.splitext(database)[0]
+    return "{0}.search".format(name) if table == "Verses" else "{0}_{1}.search".format(name, table)
+
+# index file of a bible, if it is up to date; otherwise it is built in a background thread, and None is returned
+# an index file gets the modified time of its module, so that it is built again when the module changes
+def getSearchIndex(database, table):
+    if not config.enableSearchIndex:
+        return None
+    fileName = getSearchIndexFile(database, table)
+    if os.path.isfile(fileName) and os.path.getmtime(fileName) == os.path.getmtime(database):
+        return fileName
+    if not fileName in searchIndexes:
+        searchIndexes[fileName] = True
+        threading.Thread(target=buildSearchIndex, args=(database, table, fileName), daemon=True).start()
+    return None
+
+def buildSearchIndex(database, table, fileName):
+    temporaryFile = "{0}.{1}.tmp".format(fileName, threading.get_ident())
+    try:
+        if table == "Verses":
+            removeSearchIndexTables(database)
+        moduleTime = os.path.getmtime(database)
+        connection = sqlite3.connect(database, timeout=30)
+        verses = connection.execute("SELECT rowid, Scripture FROM {0}".format(table)).fetchall()
+        connection.close()
+        connection = sqlite3.connect(temporaryFile)
+        with connection:
+            connection.execute("CREATE VIRTUAL TABLE VersesSearch USING fts5(Scripture, tokenize='trigram')")
+            connection.executemany("INSERT INTO VersesSearch(rowid, Scripture) VALUES (?, ?)", verses)
+        connection.close()
+        os.utime(temporaryFile, (moduleTime, moduleTime))
+        os.replace(temporaryFile, fileName)
+        searchIndexes.pop(fileName, None)
+    except (sqlite3.Error, OSError):
+        # trigram tokenizer requires sqlite 3.34 or later
+        searchIndexes[fileName] = False
+        if os.path.isfile(temporaryFile):
+            os.remove(temporaryFile)
+
+# earlier versions kept the index in module files, with triggers on table Verses
+def removeSearchIndexTables(database):
+    connection = sqlite3.connect(database, timeout=30)
+    try:
+        if connection.execute("SELECT name FROM sqlite_master WHERE name LIKE 'VersesSearch%'").fetchone():
+            with connection:
+                for trigger in ("VersesSearchInsert", "VersesSearchDelete", "VersesSearchUpdate"):
+                    connection.execute("DROP TRIGGER IF EXISTS {0}".format(trigger))
+                connection.execute("DROP TABLE IF EXISTS VersesSearch")
+    finally:
+        connection.close()
+
+# verses of a bible which contain search, with "%" as wildcard, in canonical order; None if the bible is not found
+# with trigram tokenizer, "LIKE" on the index gives the same results as on the bible; the bible is scanned until the index is ready
+def searchVerses(text, search):
+    database, table = getBibleTable(text)
+    if database is None:
+        return None
+    indexFile = getSearchIndex(database, table)
+    connection, lock = databaseConnections.module(database)
+    try:
+        with lock:
+            condition = "Scripture LIKE ?"
+            if indexFile is not None:
+                connection.execute("ATTACH DATABASE ? AS searchIndex", (indexFile,))
+                condition = "rowid IN (SELECT rowid FROM searchIndex.VersesSearch WHERE Scripture LIKE ?)"
+            try:
+                verses = connection.execute("SELECT Book, Chapter, Verse, Scripture FROM {0} WHERE {1} ORDER BY Book, Chapter, Verse".format(table, condition), ("%{0}%".format(search),)).fetchall()
+            finally:
+                # index files are replaced when they are built again
+                if indexFile is not None:
+                    connection.execute("DETACH DATABASE searchIndex")
+    except sqlite3.Error:
+        return None
+    return verses
+
+
+# keep database connections open, instead of opening database files for every action
+class DatabaseConnections:
+
+    def __init__(self):
+        self.biblesSqlite = None
+        self.noteSqlite = None
+        self.notesIndex = None
+        self.moduleConnections = {}
+        self.moduleConnectionsLock = threading.Lock()
+
+    def bibles(self):
+        if self.biblesSqlite is None:
+            self.biblesSqlite = BiblesSqlite()
+        return self.biblesSqlite
+
+    def notes(self):
+        if self.noteSqlite is None:
+            self.noteSqlite = NoteSqlite()
+            # write-ahead logging; saving notes does not block reading them
+            self.noteSqlite.connection.execute("PRAGMA journal_mode=WAL")
+        return self.noteSqlite
+
+    def noteIndex(self):
+        if self.notesIndex is None:
+            self.notesIndex = NoteIndex(self.notes().connection)
+        return self.notesIndex
+
+    # one read connection for each module file, e.g. a bible, with a lock, so that threads reading modules at the same time take turns on a file
+    def module(self, database):
+        with self.moduleConnectionsLock:
+            if not database in self.moduleConnections:
+                self.moduleConnections[database] = (sqlite3.connect(database, check_same_thread=False), threading.Lock())
+            return self.moduleConnections[database]
+
+    # module files may be replaced by installing or importing modules
+    def closeModules(self):
+        with self.moduleConnectionsLock:
+            for connection, lock in self.moduleConnections.values():
+                with lock:
+                    connection.close()
+            self.moduleConnections.clear()
+
+    def close(self):
+        # connections are closed when objects are deleted
+        self.biblesSqlite = None
+        self.noteSqlite = None
+        self.notesIndex = None
+        self.closeModules()
+
+databaseConnections = DatabaseConnections()
+
+# compare opening databases for every chapter navigation with keeping them open, e.g. python3 -c "import gui; gui.benchmarkDatabaseConnections()"
+# each navigation reads the chapter list of the main bible and the note of a chapter, as previous / next chapter and chapter notes do
+def benchmarkDatabaseConnections(navigations=200):
+    results = {}
+    databases = DatabaseConnections()
+    for mode in ("before", "after"):
+        start = time.perf_counter()
+        for i in range(navigations):
+            chapter = i % 50 + 1
+            if mode == "before":
+                biblesSqlite = BiblesSqlite()
+                biblesSqlite.getChapterList()
+                del biblesSqlite
+                noteSqlite = NoteSqlite()
+                noteSqlite.displayChapterNote((config.mainB, chapter))
+                del noteSqlite
+            else:
+                databases.bibles().getChapterList()
+                databases.notes().displayChapterNote((config.mainB, chapter))
+        duration = (time.perf_counter() - start) / navigations
+        results[mode] = duration
+        print("{0}: {1} navigations, {2:.2f}ms per navigation".format(mode, navigations, duration * 1000))
+    databases.close()
+    print("speedup: {0:.2f}x".format(results["before"] / results["after"]))
+    return results
+
+
+# compare looking up verses by computed ids on a new connection with joining a temporary verse list on a kept connection
+def benchmarkMultipleVerses(text="KJV", sizes=(10, 1000, 10000), repeats=5):
+    database, table = getBibleTable(text)
+    if database is None:
+        print("Bible '{0}' is not installed.".format(text))
+        return None
+    connection, lock = databaseConnections.module(database)
+    with lock:
+        verseIds = [encodeVerseId(b, c, v) for b, c, v in connection.execute("SELECT Book, Chapter, Verse FROM {0} ORDER BY Book, Chapter, Verse".format(table))]
+    results = {}
+    for size in sizes:
+        verseList = [decodeVerseId(verseId) for verseId in verseIds[::max(1, len(verseIds) // size)][:size]]
+        for mode in ("before", "after"):
+            start = time.perf_counter()
+            for i in range(repeats):
+                if mode == "before":
+                    before = sqlite3.connect(database)
+                    ids = [encodeVerseId(b, c, v) for b, c, v in verseList]
+                    before.execute("SELECT Book, Chapter, Verse, Scripture FROM {0} WHERE (Book << 16) | (Chapter << 8) | Verse IN ({1})".format(table, ", ".join(["?"] * len(ids))), ids).fetchall()
+                    before.close()
+                else:
+                    readMultipleVerses(text, verseList)
+            duration = (time.perf_counter() - start) / repeats
+            results[(size, mode)] = duration
+            print("{0} verses, {1}: {2:.2f}ms".format(len(verseList), mode, duration * 1000))
+        print("{0} verses, speedup: {1:.2f}x".format(len(verseList), results[(size, "before")] / results[(size, "after")]))
+    return results
+
+
+# chapters and verses which have notes, loaded once and updated when notes are saved
+# verses of a chapter are kept as bits of an integer, bit v for verse v
+class NoteIndex:
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.chapters = set()
+        self.verses = {}
+        for b, c in connection.execute("SELECT DISTINCT Book, Chapter FROM ChapterNote WHERE Note != ''"):
+            self.chapters.add((b, c))
+        for b, c, v in connection.execute("SELECT Book, Chapter, Verse FROM VerseNote WHERE Note != ''"):
+            self.verses[(b, c)] = self.verses.get((b, c), 0) | (1 << v)
+
+    # returns whether the chapter has a note, and the verses of the chapter which have notes
+    def getChapterNotes(self, b, c):
+        bits = self.verses.get((b, c), 0)
+        return ((b, c) in self.chapters, [v for v in range(bits.bit_length()) if bits >> v & 1])
+
+    def updateChapter(self, b, c):
+        self.chapters.discard((b, c))
+        if self.connection.execute("SELECT 1 FROM ChapterNote WHERE Book=? AND Chapter=? AND Note != '' LIMIT 1", (b, c)).fetchone():
+            self.chapters.add((b, c))
+
+    def updateVerse(self, b, c, v):
+        bits = self.verses.get((b, c), 0) & ~(1 << v)
+        if self.connection.execute("SELECT 1 FROM VerseNote WHERE Book=? AND Chapter=? AND Verse=? AND Note != '' LIMIT 1", (b, c, v)).fetchone():
+            bits |= 1 << v
+        if bits:
+            self.verses[(b, c)] = bits
+        else:
+            self.verses.pop((b, c), None)
+
+
+# process files with a pool of processes, for work bound by cpu, which threads cannot share, e.g. tagging and importing
+# function(fileName, *args, *fileArguments[fileName]) runs in worker processes and returns a tuple, starting with size of the file
+# fileProcessed is emitted in the gui thread for every file, with an error message or an empty string, and the result of the function
+class FileProcessPool(QObject):
+    fileProcessed = Signal(str, str, object)
+
+    def __init__(self, files, processes, function, *args, fileArguments=None):
+        super().__init__()
+        self.files = files
+        self.processes = processes
+        self.function, self.args = function, args
+        self.fileArguments = fileArguments or {}
+        self.futures = []
+        self.executor = None
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.processes or os.cpu_count(), mp_context=processContext)
+        for fileName in self.files:
+            future = self.executor.submit(self.function, fileName, *self.args, *self.fileArguments.get(fileName, ()))
+            future.add_done_callback(lambda future, fileName=fileName: self.processingDone(fileName, future))
+            self.futures.append(future)
+        # workers are released when submitted files are all done
+        self.executor.shutdown(wait=False)
+
+    # called in a thread of the executor; signals deliver results to the gui thread
+    def processingDone(self, fileName, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.fileProcessed.emit(fileName, "", future.result())
+        else:
+            self.fileProcessed.emit(fileName, str(error), None)
+
+    def cancel(self):
+        for future in self.futures:
+            future.cancel()
+
+
+# Converter methods for each type of 3rd party module, in the order of checking, as in importModules
+moduleImporters = (
+    ((".dct.mybible", ".dcti", ".lexi", ".dictionary.SQLite3"), "dictionary"),
+    ((".bbl.mybible",), "importMySwordBible"),
+    ((".cmt.mybible",), "importMySwordCommentary"),
+    ((".bbli",), "importESwordBible"),
+    ((".cmti",), "importESwordCommentary"),
+    ((".refi",), "importESwordBook"),
+    ((".commentaries.SQLite3",), "importMyBibleCommentary"),
+    ((".SQLite3",), "importMyBibleBible"),
+)
+
+def getModuleImporter(fileName):
+    for extensions, importer in moduleImporters:
+        if fileName.endswith(extensions):
+            return importer
+    return None
+
+# runs in worker processes; import settings changed in this session are not in config.py, which workers load
+def importModuleInProcess(fileName, importSettings):
+    start = time.perf_counter()
+    for key, value in importSettings.items():
+        setattr(config, key, value)
+    importer = getModuleImporter(fileName)
+    if importer == "dictionary":
+        *_, name = os.path.split(fileName)
+        copyfile(fileName, os.path.join("thirdParty", "dictionaries", name))
+    else:
+        getattr(Converter(), importer)(fileName)
+    return (os.path.getsize(fileName), time.perf_counter() - start)
+
+
+# files of a folder which are tagged, recorded in a hidden file of the folder
+# a file is tagged again when its content, the app version or the parser standardisation changes
+class TaggingManifest:
+
+    def __init__(self, directory):
+        # records are keyed by paths relative to the folder
+        self.directory = directory
+        self.fileName = os.path.join(directory, ".tagging_manifest.json")
+        self.records = {}
+        if os.path.isfile(self.fileName):
+            try:
+                with open(self.fileName, "r", encoding="utf-8") as fileObject:
+                    self.records = json.load(fileObject)
+            except (OSError, ValueError):
+                self.records = {}
+
+    def getChangedFiles(self, files):
+        return [fileName for fileName in files if not self.isTagged(fileName)]
+
+    def isTagged(self, fileName):
+        record = self.getRecord(fileName)
+        return record is not None and os.stat(fileName).st_mtime == record["mtime"]
+
+    # record of a file tagged with current settings, of which size is not changed; None otherwise
+    def getRecord(self, fileName):
+        record = self.records.get(os.path.relpath(fileName, self.directory), None)
+        path, name = os.path.split(fileName)
+        if record is None or record["parserVersion"] != config.version or record["parserStandarisation"] != config.parserStandarisation or not os.path.isfile(os.path.join(path, "tagged_{0}".format(name))):
+            return None
+        if os.stat(fileName).st_size != record["size"]:
+            return None
+        return record
+
+    # modified time changes when a file is saved or copied without changes; workers compare content with this hash
+    def getKnownHash(self, fileName):
+        record = self.getRecord(fileName)
+        return record["hash"] if record is not None else None
+
+    # fileStatus: size, modified time and hash, as read by workers
+    def update(self, fileName, fileStatus):
+        size, mtime, fileHash = fileStatus
+        self.records[os.path.relpath(fileName, self.directory)] = {
+            "size": size,
+            "mtime": mtime,
+            "hash": fileHash,
+            "parserVersion": config.version,
+            "parserStandarisation": config.parserStandarisation,
+        }
+
+    def save(self):
+        try:
+            with open(self.fileName, "w", encoding="utf-8") as fileObject:
+                json.dump(self.records, fileObject, indent=1)
+        except OSError:
+            print("Failed to save '{0}'".format(self.fileName))
+
+# files in a folder and its subfolders, except hidden files and tagged outputs
+def getFilesToTag(directory):
+    files = []
+    for path, folders, fileNames in os.walk(directory):
+        folders[:] = sorted([folder for folder in folders if not folder.startswith(".")])
+        files += [os.path.join(path, fileName) for fileName in sorted(fileNames) if not fileName.startswith((".", "tagged_"))]
+    return files
+
+def getFileHash(fileName, blockSize=1048576):
+    fileHash = hashlib.sha1()
+    with open(fileName, "rb") as fileObject:
+        for block in iter(lambda: fileObject.read(blockSize), b""):
+            fileHash.update(block)
+    return fileHash.hexdigest()
+
+
+# functions run in worker processes have to be defined at module level
+# returns size of the file, seconds spent, and size, modified time and hash of the file, if hashContent is True
+# files of which hash is knownHash are not tagged again
+def tagFileInProcess(fileName, standarisation, hashContent=False, knownHash=None):
+    start = time.perf_counter()
+    status = os.stat(fileName)
+    fileStatus = None
+    if hashContent:
+        fileStatus = (status.st_size, status.st_mtime, getFileHash(fileName))
+        if knownHash is not None and fileStatus[2] == knownHash:
+            return (status.st_size, time.perf_counter() - start, fileStatus)
+    if status.st_size > config.streamingTaggingSize * 1048576:
+        tagLargeFile(fileName, standarisation)
+    else:
+        getBibleVerseParser(standarisation).startParsing(fileName)
+    return (status.st_size, time.perf_counter() - start, fileStatus)
+
+# tag a file chunk by chunk, so that memory used does not grow with the size of the file
+# chunks are cut at line ends, or between words for very long lines, so that references are not broken
+def tagLargeFile(fileName, standarisation=None, chunkSize=1048576):
+    parser = getBibleVerseParser(standarisation)
+    bookNamePattern = getBookNamePattern(parser)
+    path, name = os.path.split(fileName)
+    outputFile = os.path.join(path, "tagged_{0}".format(name))
+    start = time.perf_counter()
+    with open(fileName, "r", encoding="utf-8", newline="") as inputFileObject, open(outputFile, "w", encoding="utf-8", newline="") as outputFileObject:
+        text = ""
+        while True:
+            chunk = inputFileObject.read(chunkSize)
+            text += chunk
+            if not chunk:
+                if text:
+                    outputFileObject.write(parseReferences(text, parser))
+                break
+            boundary = taggingBoundary(text, bookNamePattern)
+            # without a safe place to cut, text is carried over to the next chunk
+            if boundary:
+                outputFileObject.write(parseReferences(text[:boundary], parser))
+                text = text[boundary:]
+    return (os.path.getsize(fileName), time.perf_counter() - start)
+
+# position after the last line end, or else after the last whitespace which does not break a reference; 0 if there is none
+# e.g. text is not cut in "Rom. 8:28", "1 Cor 13", or "Gen 1:1; 2:3, 5"
+def taggingBoundary(text, bookNamePattern=None):
+    boundary = text.rfind("\n") + 1
+    if boundary:
+        return boundary
+    # sentence ends are preferred; "." is also used in abbreviations of book names
+    for spaces in (r"[.!?](\s+)", r"(\s+)"):
+        for match in reversed(list(re.finditer(spaces, text))):
+            if isTaggingBoundary(text, match.start(1), match.end(1), bookNamePattern):
+                return match.end(1)
+    return 0
+
+def isTaggingBoundary(text, start, end, bookNamePattern=None):
+    # a verse number, or more references of a list, may follow
+    if end >= len(text) or text[end].isdigit():
+        return False
+    if start and text[start - 1] in (";", ","):
+        return False
+    if bookNamePattern is not None:
+        # a book name, followed by a number, across the cut, e.g. "1 Cor 13"
+        offset = max(0, start - 32)
+        for match in bookNamePattern.finditer(text, offset, min(len(text), end + 32)):
+            if match.start() < end and match.end() > start:
+                return False
+    return True
+
+# compare serial and parallel tagging on generated files, e.g. python3 -c "import gui; gui.benchmarkTagging()"
+def benchmarkTagging(numberOfFiles=200, linesPerFile=500):
+    line = "In the beginning (Gen 1:1), the Word was (John 1:1-3); cf. Rom 8:28, Ps 23 and 1 Cor 13:4-7.\n"
+    results = {}
+    for mode in ("serial", "parallel"):
+        with tempfile.TemporaryDirectory() as directory:
+            files = []
+            for i in range(numberOfFiles):
+                fileName = os.path.join(directory, "notes{0}.txt".format(i))
+                with open(fileName, "w", encoding="utf-8") as fileObject:
+                    fileObject.write(line * linesPerFile)
+                files.append(fileName)
+            start = time.perf_counter()
+            if mode == "serial":
+                size = sum([tagFileInProcess(fileName, config.parserStandarisation)[0] for fileName in files])
+            else:
+                with ProcessPoolExecutor(max_workers=config.taggingProcesses or os.cpu_count(), mp_context=processContext) as executor:
+                    size = sum([result[0] for result in executor.map(tagFileInProcess, files, [config.parserStandarisation] * len(files))])
+            duration = time.perf_counter() - start
+        results[mode] = duration
+        print("{0}: {1} files in {2:.2f}s; {3:.1f} files/s, {4:.2f} MB/s".format(mode, numberOfFiles, duration, numberOfFiles / duration, size / 1048576 / duration))
+    print("speedup: {0:.2f}x".format(results["serial"] / results["parallel"]))
+    return results
+
+
+# time spent in each stage of running text commands, with percentiles for each command keyword
+class LatencyRecorder:
+
+    def __init__(self, size):
+        # ring buffer of completed records
+        self.records = deque(maxlen=size)
+        # records waiting for views to finish loading
+        self.loading = {}
+
+    def start(self, textCommand):
+        if not config.enableLatencyProfiling:
+            return None
+        keyword = textCommand.split(":::", 1)[0].upper() if ":::" in textCommand else "BIBLE"
+        now = time.perf_counter()
+        return {"keyword": keyword, "stages": {}, "started": now, "last": now}
+
+    def mark(self, record, stage):
+        if record is not None:
+            now = time.perf_counter()
+            record["stages"][stage] = (now - record["last"]) * 1000
+            record["last"] = now
+
+    def finish(self, record):
+        if record is not None:
+            record["stages"]["total"] = (time.perf_counter() - record["started"]) * 1000
+            self.records.append({"keyword": record["keyword"], "stages": record["stages"]})
+
+    def waitForLoading(self, view, record):
+        if record is not None:
+            self.loading[view] = record
+
+    def finishLoading(self, view):
+        record = self.loading.pop(view, None)
+        self.mark(record, "loadFinished")
+        self.finish(record)
+
+    def getStatistics(self):
+        durations = {}
+        for record in self.records:
+            for stage, duration in record["stages"].items():
+                durations.setdefault(record["keyword"], {}).setdefault(stage, []).append(duration)
+        statistics = {}
+        for keyword, stages in durations.items():
+            statistics[keyword] = {}
+            for stage, values in stages.items():
+                values.sort()
+                statistics[keyword][stage] = {
+                    "count": len(values),
+                    "p50": self.percentile(values, 50),
+                    "p95": self.percentile(values, 95),
+                    "p99": self.percentile(values, 99),
+                }
+        return statistics
+
+    def percentile(self, values, percent):
+        index = max(math.ceil(len(values) * percent / 100) - 1, 0)
+        return values[index]
+
+    def exportJson(self, fileName):
+        # durations are in milliseconds
+        with open(fileName, "w") as fileObject:
+            json.dump({"statistics": self.getStatistics(), "records": list(self.records)}, fileObject, indent=2)
+
+
+# split html content into chunks of about chunkSize characters, without breaking block elements
+def htmlChunks(content, chunkSize):
+    tags = re.compile("<(/?)([A-Za-z][A-Za-z0-9]*)\\b[^<>]*?(/?)>")
+    voidTags = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+    blockTags = {"br", "div", "p", "table", "ul", "ol", "blockquote", "h1", "h2", "h3", "h4", "h5", "h6"}
+    # chunks are inserted one by one, so that they are cut only where no element is open
+    openTags = []
+    start = 0
+    for match in tags.finditer(content):
+        closing, tag, selfClosing = match.groups()
+        tag = tag.lower()
+        if closing:
+            # elements without end tags, e.g. <li>, are closed by their parents
+            if tag in openTags:
+                del openTags[len(openTags) - 1 - openTags[::-1].index(tag):]
+        elif not (selfClosing or tag in voidTags):
+            openTags.append(tag)
+        if not openTags and tag in blockTags and match.end() - start >= chunkSize:
+            yield content[start:match.end()]
+            start = match.end()
+    if start < len(content):
+        yield content[start:]
+
+
+# rewrite bcv(...) / cr(...) links in a single pass over rendered html
+class LinkRewriter:
+
+    linkPattern = re.compile(r"""onclick=['"](bcv|cr)\(([0-9]+?),[ ]*?([0-9]+?),[ ]*?([0-9]+?)\)['"]""")
+
+    def __init__(self):
+        # MyBible book numbers (10, 20, 30, ...) mapped to UBA book numbers
+        self.myBibleBookNo = {}
+
+    def rewrite(self, html):
+        return self.linkPattern.sub(self.rewriteLink, html)
+
+    def rewriteLink(self, match):
+        function, b, c, v = match.groups()
+        if function == "cr":
+            b = self.convertMyBibleBookNo(int(b))
+        return 'onclick="bcv({0},{1},{2})" onmouseover="imv({0},{1},{2})"'.format(b, c, v)
+
+    # each book number is converted once; errors of unknown numbers are raised as before
+    def convertMyBibleBookNo(self, myBibleBookNo):
+        if not myBibleBookNo in self.myBibleBookNo:
+            self.myBibleBookNo[myBibleBookNo] = Converter().convertMyBibleBookNo(myBibleBookNo)
+        return self.myBibleBookNo[myBibleBookNo]
+
+# compare rewriting links of a generated chapter with two regular expression passes and with LinkRewriter, e.g. python3 -c "import gui; gui.benchmarkLinkRewriting()"
+def benchmarkLinkRewriting(numberOfLinks=5000, repeat=20):
+    html = "".join(["<p><ref onclick='bcv(43,3,{0})'>John 3:{0}</ref> text <ref onclick='cr(500,{1},{0})'>link</ref></p>".format(i % 255 + 1, i % 20 + 1) for i in range(numberOfLinks)])
+    searchReplace = (
+        ('onclick=[{0}"]bcv\(([0-9]+?),[ ]*?([0-9]+?),[ ]*?([0-9]+?)\)[{0}"]'.format("'"), r'onclick="bcv(\1,\2,\3)" onmouseover="imv(\1,\2,\3)"'),
+        ('onclick=[{0}"]cr\(([0-9]+?),[ ]*?([0-9]+?),[ ]*?([0-9]+?)\)[{0}"]'.format("'"), lambda match: 'onclick="bcv({0},{1},{2})" onmouseover="imv({0},{1},{2})"'.format(Converter().convertMyBibleBookNo(int(match.group(1))), match.group(2), match.group(3))),
+    )
+    results = {}
+    for mode in ("before", "after"):
+        start = time.perf_counter()
+        for i in range(repeat):
+            if mode == "before":
+                output = html
+                for search, replace in searchReplace:
+                    output = re.sub(search, replace, output)
+            else:
+                output = LinkRewriter().rewrite(html)
+        duration = (time.perf_counter() - start) / repeat
+        results[mode] = duration
+        print("{0}: {1} links in {2:.2f}ms per page".format(mode, numberOfLinks * 2, duration * 1000))
+    print("speedup: {0:.2f}x".format(results["before"] / results["after"]))
+    return results
+
+
+# least recently used cache of rendered pages, bounded by total size in bytes
+class PageCache:
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.size = 0
+        self.pages = OrderedDict()
+        # counters for checking the effectiveness of the cache
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.pages
+
+    def get(self, key):
+        if key in self.pages:
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return self.pages[key][0]
+        self.misses += 1
+        return None
+
+    # marks a page as recently used, without counting a hit; returns its size, or None if it is not cached
+    def touch(self, key):
+        if key in self.pages:
+            self.pages.move_to_end(key)
+            return self.pages[key][1]
+        return None
+
+    def set(self, key, page, size):
+        if key in self.pages:
+            self.size -= self.pages.pop(key)[1]
+        if size > self.maxSize:
+            return
+        self.pages[key] = (page, size)
+        self.size += size
+        while self.size > self.maxSize:
+            *_, oldSize = self.pages.popitem(last=False)[1]
+            self.size -= oldSize
+
+    def clear(self):
+        self.pages.clear()
+        self.size = 0
+
+
+# serve pages from memory via uba: urls, e.g. uba:main/0 for the first tab on main view
+class PageSchemeHandler(QWebEngineUrlSchemeHandler):
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.pages = {}
+
+    def setPage(self, name, content):
+        # resources linked by the page are located in folder "htmlResources"
+        self.pages[name] = content.replace(b"<head>", "<head><meta charset='utf-8'><base href='{0}'>".format(baseUrl.toString()).encode("utf-8"), 1)
+        return QUrl("uba:{0}".format(name))
+
+    def requestStarted(self, job):
+        name = job.requestUrl().path()
+        if name in self.pages:
+            # buffer is deleted together with the job
+            buffer = QBuffer(job)
+            buffer.setData(self.pages[name])
+            job.reply(b"text/html", buffer)
+        else:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+
+# compare loading generated pages with setHtml, from a temporary file and from memory with the uba scheme, e.g. python3 -c "import gui; gui.benchmarkPageLoading()"
+# setHtml is measured only for pages below its 2MB limit
+def benchmarkPageLoading(sizes=(1, 4, 16), repeat=5):
+    global baseUrl
+    baseUrl = QUrl.fromLocalFile(os.path.abspath(os.path.join("htmlResources", "theText.png")))
+    app = QApplication.instance() or QApplication(sys.argv)
+    view = QWebEngineView()
+    pageSchemeHandler = PageSchemeHandler(view)
+    QWebEngineProfile.defaultProfile().installUrlSchemeHandler(b"uba", pageSchemeHandler)
+    loop = QEventLoop()
+    view.loadFinished.connect(lambda ok: loop.quit())
+    verse = "<verse><ref onclick='bcv(43,3,16)'>John 3:16</ref> For God so loved the world, that he gave his only begotten Son.</verse><br>"
+    results = {}
+    for size in sizes:
+        html = "<!DOCTYPE html><html><head><title>UniqueBible.app</title><link rel='stylesheet' type='text/css' href='theText.css'></head><body>{0}</body></html>".format(verse * (size * 1048576 // len(verse)))
+        content = html.encode("utf-8")
+        for mode in ("setHtml", "file", "uba"):
+            if mode == "setHtml" and len(content) * 4 / 3 >= 2097152:
+                continue
+            start = time.perf_counter()
+            for i in range(repeat):
+                if mode == "setHtml":
+                    view.setHtml(html, baseUrl)
+                elif mode == "file":
+                    fileName = os.path.abspath(os.path.join("htmlResources", "benchmark.html"))
+                    with open(fileName, "wb") as fileObject:
+                        fileObject.write(content)
+                    view.load(QUrl.fromLocalFile(fileName))
+                else:
+                    view.load(pageSchemeHandler.setPage("benchmark/{0}".format(i), content))
+                loop.exec_()
+            duration = (time.perf_counter() - start) / repeat
+            results[(size, mode)] = duration
+            print("{0}MB, {1}: {2:.1f}ms per page".format(size, mode, duration * 1000))
+    if os.path.isfile(os.path.join("htmlResources", "benchmark.html")):
+        os.remove(os.path.join("htmlResources", "benchmark.html"))
+    QWebEngineProfile.defaultProfile().removeUrlSchemeHandler(pageSchemeHandler)
+    return results
+
+
+linkRewriter = LinkRewriter()